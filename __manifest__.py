@@ -28,6 +28,7 @@
         
         # Data
         'data/sequences.xml',
+        'data/ir_cron.xml',
         
         # Views
         'views/customer_views.xml',
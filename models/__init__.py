@@ -1,5 +1,6 @@
 
 from . import core_banking
+from . import ir_sequence
 from . import customer
 from . import account
 from . import transaction
@@ -1,10 +1,22 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.sql import create_index
+from .tools import create_generated_column
 from datetime import date, datetime, timedelta
+from collections import defaultdict
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# PostgreSQL intervals for each standing order frequency
+FREQUENCY_INTERVALS = {
+    'daily': '1 day',
+    'weekly': '1 week',
+    'monthly': '1 month',
+    'quarterly': '3 months',
+    'yearly': '1 year',
+}
+
 class Account(models.Model):
     _name = 'core_banking.account'
     _description = 'Bank Account'
@@ -33,7 +45,8 @@ class Account(models.Model):
     
     # Balance Information
     balance = fields.Monetary(string='Current Balance', default=0.0, tracking=True)
-    available_balance = fields.Monetary(string='Available Balance', compute='_compute_available_balance', store=True)
+    # Not stored by the ORM: init() maintains a matching generated column for SQL readers
+    available_balance = fields.Monetary(string='Available Balance', compute='_compute_available_balance')
     hold_amount = fields.Monetary(string='Amount on Hold', default=0.0)
     
     # Status Information
@@ -81,12 +94,21 @@ class Account(models.Model):
     
     # Related Models
     transaction_ids = fields.One2many('core_banking.transaction', 'account_id', string='Transactions')
-    standing_order_ids = fields.One2many('core_banking.standing.order', 'account_id', string='Standing Orders')
+    standing_order_ids = fields.One2many('core_banking.standing.order', 'source_account_id', string='Standing Orders')
     
     _sql_constraints = [
         ('account_number_uniq', 'unique (account_number, company_id)', 'Account Number must be unique per company!'),
     ]
     
+    def init(self):
+        # Keep available_balance as a generated column so the database maintains it
+        create_generated_column(self.env.cr, self._table, 'available_balance', """
+            CASE WHEN allow_overdraft
+                 THEN balance + COALESCE(overdraft_limit, 0) - COALESCE(hold_amount, 0)
+                 ELSE GREATEST(0, balance - COALESCE(hold_amount, 0))
+            END
+        """)
+    
     @api.depends('balance', 'hold_amount', 'overdraft_limit', 'allow_overdraft')
     def _compute_available_balance(self):
         for account in self:
@@ -97,9 +119,10 @@ class Account(models.Model):
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('account_number', 'New') == 'New':
-                vals['account_number'] = self.env['ir.sequence'].next_by_code('core_banking.account') or 'New'
+        to_number = [vals for vals in vals_list if vals.get('account_number', 'New') == 'New']
+        numbers = self.env['ir.sequence']._next_by_code_batch('core_banking.account', len(to_number))
+        for vals, number in zip(to_number, numbers):
+            vals['account_number'] = number or 'New'
         return super().create(vals_list)
     
     def action_activate(self):
@@ -125,7 +148,7 @@ class Account(models.Model):
     def action_mark_dormant(self):
         self.write({'state': 'dormant'})
     
-    def deposit(self, amount, reference='', description=''):
+    def deposit(self, amount, reference='', description='', when=None):
         """Process a deposit transaction"""
         if amount <= 0:
             raise UserError(_('Deposit amount must be positive'))
@@ -144,11 +167,11 @@ class Account(models.Model):
         
         # Update account balance
         self.balance += amount
-        self.last_transaction_date = fields.Datetime.now()
+        self.last_transaction_date = when or fields.Datetime.now()
         
         return transaction
     
-    def withdraw(self, amount, reference='', description=''):
+    def withdraw(self, amount, reference='', description='', when=None):
         """Process a withdrawal transaction"""
         if amount <= 0:
             raise UserError(_('Withdrawal amount must be positive'))
@@ -171,9 +194,80 @@ class Account(models.Model):
         
         # Update account balance
         self.balance -= amount
-        self.last_transaction_date = fields.Datetime.now()
+        self.last_transaction_date = when or fields.Datetime.now()
         
         return transaction
+    
+    @api.model
+    def bulk_deposit(self, amount_map, reference_map=None, description_map=None, when=None):
+        """Process deposits into several accounts at once
+        
+        :param amount_map: dict mapping account id to the amount to deposit
+        :param reference_map: optional dict mapping account id to a reference
+        :param description_map: optional dict mapping account id to a description
+        :return: the created transactions
+        """
+        if any(amount <= 0 for amount in amount_map.values()):
+            raise UserError(_('Deposit amount must be positive'))
+        
+        when = when or fields.Datetime.now()
+        reference_map = reference_map or {}
+        description_map = description_map or {}
+        transactions = self.env['core_banking.transaction'].create([{
+            'account_id': account_id,
+            'transaction_type': 'deposit',
+            'amount': amount,
+            'reference': reference_map.get(account_id, ''),
+            'description': description_map.get(account_id) or f"Deposit: {reference_map.get(account_id, '')}",
+            'state': 'posted',
+            'transaction_date': when,
+        } for account_id, amount in amount_map.items()])
+        self._apply_balance_deltas(amount_map, when=when)
+        return transactions
+    
+    def _lock_balances(self):
+        """Lock these accounts in id order and reload their balances
+        
+        A consistent lock order keeps concurrent postings on overlapping
+        accounts from deadlocking each other.
+        """
+        if not self:
+            return
+        self.flush_recordset(['balance', 'hold_amount', 'overdraft_limit', 'allow_overdraft'])
+        self.env.cr.execute(
+            "SELECT id FROM core_banking_account WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+            [sorted(self.ids)],
+        )
+        self.invalidate_recordset(['balance', 'available_balance'])
+    
+    def _apply_balance_deltas(self, deltas, when=None, check_available=False):
+        """Add net amounts to account balances in a single UPDATE
+        
+        :param deltas: dict mapping account id to the signed amount to add
+        :param when: last transaction date to stamp on every account, defaults to now
+        :param check_available: refuse net debits exceeding the available balance,
+                                checked by the UPDATE itself against the current row
+        """
+        if not deltas:
+            return
+        self.flush_model(['balance', 'last_transaction_date', 'hold_amount', 'overdraft_limit', 'allow_overdraft'])
+        self.env.cr.execute("""
+            UPDATE core_banking_account AS account
+               SET balance = account.balance + delta.amount,
+                   last_transaction_date = %s
+              FROM unnest(%s::int[], %s::numeric[]) AS delta(id, amount)
+             WHERE account.id = delta.id
+               AND (NOT %s OR delta.amount >= 0 OR delta.amount + account.available_balance >= 0)
+         RETURNING account.id
+        """, (when or fields.Datetime.now(), list(deltas), list(deltas.values()), check_available))
+        updated_ids = {row[0] for row in self.env.cr.fetchall()}
+        accounts = self.browse(list(deltas))
+        accounts.invalidate_recordset(['balance', 'available_balance', 'last_transaction_date'])
+        refused = accounts.filtered(lambda account: account.id not in updated_ids)
+        if refused:
+            raise UserError(_('Insufficient available balance on account(s): %s') %
+                            ', '.join(refused.mapped('display_name')))
+        accounts.modified(['balance'])
 
 
 class AccountType(models.Model):
@@ -221,7 +315,7 @@ class StandingOrder(models.Model):
         ('quarterly', 'Quarterly'),
         ('yearly', 'Yearly')
     ], string='Frequency', required=True, default='monthly')
-    next_execution_date = fields.Date(string='Next Execution Date', required=True)
+    next_execution_date = fields.Date(string='Next Execution Date', required=True, index=True)
     end_date = fields.Date(string='End Date')
     reference = fields.Char(string='Payment Reference')
     state = fields.Selection([
@@ -229,18 +323,24 @@ class StandingOrder(models.Model):
         ('active', 'Active'),
         ('expired', 'Expired'),
         ('cancelled', 'Cancelled')
-    ], string='Status', default='draft', tracking=True)
+    ], string='Status', default='draft', tracking=True, index=True)
     
     # Audit Fields
     created_by = fields.Many2one('res.users', string='Created By', default=lambda self: self.env.user,
                                ondelete='set null')
     created_date = fields.Datetime(string='Created On', default=fields.Datetime.now)
     
+    def init(self):
+        # Partial index matching the standing order cron predicate
+        create_index(self.env.cr, 'core_banking_standing_order_due_idx', self._table,
+                     ['next_execution_date'], where="state = 'active'")
+    
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.standing.order') or 'New'
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.standing.order', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
         return super().create(vals_list)
     
     def action_activate(self):
@@ -252,6 +352,7 @@ class StandingOrder(models.Model):
     def _cron_process_standing_orders(self):
         """Process standing orders that are due for execution"""
         today = fields.Date.today()
+        now = fields.Datetime.now()
         due_orders = self.search([
             ('state', '=', 'active'),
             ('next_execution_date', '<=', today),
@@ -259,35 +360,79 @@ class StandingOrder(models.Model):
             ('end_date', '=', False),
             ('end_date', '>=', today)
         ])
+        if not due_orders:
+            return
+        
+        # Read every value the loop needs up front; many2ones come back as plain ids
+        order_data = due_orders.read(['name', 'source_account_id', 'destination_account_id',
+                                      'beneficiary_name', 'amount', 'reference'], load=None)
+        source_accounts = due_orders.source_account_id
+        # Display names are only needed where the order has no beneficiary name
+        destinations = self.env['core_banking.account'].browse({
+            order['destination_account_id'] for order in order_data if not order['beneficiary_name']
+        })
+        destination_names = dict(zip(destinations.ids, destinations.mapped('display_name')))
+        
+        # Orders are checked against a running available balance per account so
+        # that all withdrawals can be posted with one create and one UPDATE. The
+        # accounts stay locked until commit so no other posting can interleave.
+        source_accounts._lock_balances()
+        available = dict(zip(source_accounts.ids, source_accounts.mapped('available_balance')))
+        deltas = defaultdict(float)
+        transaction_vals_list = []
+        executed_ids = []
         
-        for order in due_orders:
-            try:
-                # Process the standing order
-                order.account_id.withdraw(
-                    order.amount,
-                    reference=order.reference or f'SO-{order.name}',
-                    description=f'Standing Order to {order.beneficiary_name or order.destination_account_id.display_name}'
-                )
-                
-                # Schedule next execution
-                order._schedule_next_execution()
-                
-            except Exception as e:
-                # Log error and continue with next order
-                _logger.error(f"Error processing standing order {order.name}: {str(e)}")
+        for order in order_data:
+            account_id = order['source_account_id']
+            amount = order['amount']
+            if amount <= 0:
+                _logger.error(f"Error processing standing order {order['name']}: Withdrawal amount must be positive")
+                continue
+            if amount > available[account_id]:
+                _logger.error(f"Error processing standing order {order['name']}: "
+                              f"Insufficient available balance. Available: {available[account_id]}")
+                continue
+            
+            available[account_id] -= amount
+            deltas[account_id] -= amount
+            beneficiary = order['beneficiary_name'] or destination_names.get(order['destination_account_id'], '')
+            transaction_vals_list.append({
+                'account_id': account_id,
+                'transaction_type': 'withdrawal',
+                'amount': -amount,
+                'reference': order['reference'] or f"SO-{order['name']}",
+                'description': f'Standing Order to {beneficiary}',
+                'state': 'posted',
+                'transaction_date': now,
+            })
+            executed_ids.append(order['id'])
+        
+        if not transaction_vals_list:
+            return
+        
+        # Skip mail tracking on these system-generated transactions
+        self.env['core_banking.transaction']._without_tracking().create(transaction_vals_list)
+        self.env['core_banking.account']._apply_balance_deltas(deltas, when=now)
+        
+        self.browse(executed_ids)._schedule_next_execution()
     
     def _schedule_next_execution(self):
         """Schedule the next execution date based on frequency"""
-        self.ensure_one()
-        if not self.next_execution_date:
+        order_ids_by_frequency = defaultdict(list)
+        for order in self:
+            if order.next_execution_date:
+                order_ids_by_frequency[order.frequency].append(order.id)
+        if not order_ids_by_frequency:
             return
-            
-        delta = {
-            'daily': 1,
-            'weekly': 7,
-            'monthly': 30,
-            'quarterly': 90,
-            'yearly': 365
-        }.get(self.frequency, 30)
         
-        self.next_execution_date = fields.Date.to_date(self.next_execution_date) + timedelta(days=delta)
+        # Calendar intervals follow the length of each month instead of a fixed day
+        # count. Each step starts from the stored date, so an order clamped to the
+        # end of a short month keeps that day (Jan 31 -> Feb 28 -> Mar 28).
+        self.flush_recordset(['next_execution_date'])
+        for frequency, order_ids in order_ids_by_frequency.items():
+            self.env.cr.execute("""
+                UPDATE core_banking_standing_order
+                   SET next_execution_date = (next_execution_date + %s::interval)::date
+                 WHERE id = ANY(%s)
+            """, (FREQUENCY_INTERVALS.get(frequency, '1 month'), order_ids))
+        self.invalidate_recordset(['next_execution_date'])
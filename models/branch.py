@@ -6,6 +6,7 @@ class Branch(models.Model):
     _name = 'core_banking.branch'
     _description = 'Bank Branch'
     _order = 'name'
+    _rec_names_search = ['name', 'code']
     
     name = fields.Char(string='Branch Name', required=True)
     code = fields.Char(string='Branch Code', required=True)
@@ -26,13 +27,13 @@ class Branch(models.Model):
     swift_code = fields.Char(string='SWIFT Code')
     sort_code = fields.Char(string='Sort Code')
     
+    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
+    
     _sql_constraints = [
         ('code_uniq', 'unique (code, company_id)', 'Branch code must be unique per company!'),
     ]
     
-    def name_get(self):
-        result = []
+    @api.depends('code', 'name')
+    def _compute_display_name(self):
         for branch in self:
-            name = f"[{branch.code}] {branch.name}"
-            result.append((branch.id, name))
-        return result
+            branch.display_name = f"[{branch.code}] {branch.name}"
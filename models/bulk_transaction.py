@@ -1,10 +1,22 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.sql import create_index
+from .transaction import WITHOUT_TRACKING_CONTEXT
+from collections import defaultdict
 import csv
 import base64
+import codecs
 import io
 
+# Individual transaction type created for each bulk transaction type
+BULK_TRANSACTION_TYPES = {
+    'bulk_transfer': 'transfer',
+    'salary_payment': 'deposit',
+    'bulk_deposit': 'deposit',
+    'bulk_withdrawal': 'withdrawal',
+}
+
 class BulkTransaction(models.Model):
     _name = 'core_banking.bulk.transaction'
     _description = 'Bulk Transaction Processing'
@@ -61,9 +73,22 @@ class BulkTransaction(models.Model):
     
     @api.depends('bulk_line_ids.amount')
     def _compute_batch_info(self):
+        # Aggregate saved batches in the database instead of loading every line
+        saved = self.filtered('id')
+        totals = {}
+        if saved:
+            groups = self.env['core_banking.bulk.transaction.line']._read_group(
+                [('bulk_transaction_id', 'in', saved.ids)],
+                ['bulk_transaction_id'],
+                ['__count', 'amount:sum'],
+            )
+            totals = {batch.id: (count, amount) for batch, count, amount in groups}
         for record in self:
-            record.total_transactions = len(record.bulk_line_ids)
-            record.total_amount = sum(record.bulk_line_ids.mapped('amount'))
+            if record.id:
+                record.total_transactions, record.total_amount = totals.get(record.id, (0, 0.0))
+            else:
+                record.total_transactions = len(record.bulk_line_ids)
+                record.total_amount = sum(record.bulk_line_ids.mapped('amount'))
     
     @api.model_create_multi
     def create(self, vals_list):
@@ -80,62 +105,128 @@ class BulkTransaction(models.Model):
             raise UserError(_('Please upload a CSV file'))
         
         try:
-            # Decode the file
-            file_content = base64.b64decode(self.import_file)
-            csv_data = file_content.decode('utf-8')
-            
-            # Parse CSV
-            csv_reader = csv.DictReader(io.StringIO(csv_data))
-            lines_to_create = []
-            
-            required_fields = ['account_number', 'amount', 'reference']
-            if self.transaction_type == 'bulk_transfer':
-                required_fields.append('destination_account')
-            
-            for row_num, row in enumerate(csv_reader, start=2):
-                # Validate required fields
-                missing_fields = [field for field in required_fields if not row.get(field)]
-                if missing_fields:
-                    raise UserError(_('Missing required fields in row %d: %s') % 
-                                  (row_num, ', '.join(missing_fields)))
-                
-                # Find accounts
-                account = self.env['core_banking.account'].search([
-                    ('account_number', '=', row['account_number'])
-                ], limit=1)
-                
-                if not account:
-                    raise UserError(_('Account not found in row %d: %s') % (row_num, row['account_number']))
-                
-                destination_account = False
-                if self.transaction_type == 'bulk_transfer':
-                    destination_account = self.env['core_banking.account'].search([
-                        ('account_number', '=', row['destination_account'])
-                    ], limit=1)
-                    
-                    if not destination_account:
-                        raise UserError(_('Destination account not found in row %d: %s') % 
-                                      (row_num, row['destination_account']))
-                
-                lines_to_create.append({
-                    'bulk_transaction_id': self.id,
-                    'account_id': account.id,
-                    'destination_account_id': destination_account.id if destination_account else False,
-                    'amount': float(row['amount']),
-                    'reference': row['reference'],
-                    'description': row.get('description', ''),
-                    'row_number': row_num,
-                })
-            
-            # Create bulk transaction lines
-            self.bulk_line_ids.unlink()  # Remove existing lines
-            self.env['core_banking.bulk.transaction.line'].create(lines_to_create)
-            
+            lines_to_create = self._parse_csv_to_vals(base64.b64decode(self.import_file))
+            self._persist_vals(lines_to_create)
             self.state = 'validated'
             
         except Exception as e:
             raise UserError(_('Error processing file: %s') % str(e))
     
+    @staticmethod
+    def _read_csv_rows(file_content, required_fields):
+        """Parse and validate CSV content without touching the ORM
+        
+        :return: tuple of a list of (row_number, account_number, destination_account,
+                 amount, reference, description) tuples and a list of error messages
+        """
+        # Decode and parse the file as a stream, addressing columns by index
+        csv_reader = csv.reader(codecs.iterdecode(io.BytesIO(file_content), 'utf-8'))
+        header = next(csv_reader, [])
+        column_index = {name.strip(): index for index, name in enumerate(header)}
+        
+        missing_columns = [field for field in required_fields if field not in column_index]
+        if missing_columns:
+            return [], [_('Missing required columns: %s') % ', '.join(missing_columns)]
+        
+        required_columns = [(field, column_index[field]) for field in required_fields]
+        account_col = column_index['account_number']
+        destination_col = column_index.get('destination_account')
+        amount_col = column_index['amount']
+        reference_col = column_index['reference']
+        description_col = column_index.get('description')
+        width = len(header)
+        to_float = float
+        
+        # Validation errors are collected so the whole file is reported at once
+        errors = []
+        rows = []
+        for row_num, row in enumerate(csv_reader, start=2):
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            # Validate required fields
+            missing_fields = [field for field, col in required_columns if not row[col]]
+            if missing_fields:
+                errors.append(_('Missing required fields in row %d: %s') % 
+                              (row_num, ', '.join(missing_fields)))
+                continue
+            try:
+                amount = to_float(row[amount_col])
+            except ValueError:
+                errors.append(_('Invalid amount in row %d: %s') % (row_num, row[amount_col]))
+                continue
+            rows.append((
+                row_num,
+                row[account_col],
+                row[destination_col] if destination_col is not None else '',
+                amount,
+                row[reference_col],
+                row[description_col] if description_col is not None else '',
+            ))
+        return rows, errors
+    
+    def _parse_csv_to_vals(self, file_content):
+        """Build bulk line values from CSV content, raising on any invalid row"""
+        self.ensure_one()
+        is_transfer = self.transaction_type == 'bulk_transfer'
+        required_fields = ['account_number', 'amount', 'reference']
+        if is_transfer:
+            required_fields.append('destination_account')
+        
+        rows, errors = self._read_csv_rows(file_content, required_fields)
+        
+        # Resolve source and destination account numbers with a single query
+        account_numbers = {row[1] for row in rows}
+        if is_transfer:
+            account_numbers |= {row[2] for row in rows}
+        accounts = {
+            account['account_number']: account['id']
+            for account in self.env['core_banking.account'].search_read(
+                [('account_number', 'in', list(account_numbers))], ['account_number'], load=False)
+        }
+        
+        lines_to_create = []
+        for row_num, account_number, destination_number, amount, reference, description in rows:
+            account_id = accounts.get(account_number)
+            if not account_id:
+                errors.append(_('Account not found in row %d: %s') % (row_num, account_number))
+            
+            destination_account_id = False
+            if is_transfer:
+                destination_account_id = accounts.get(destination_number)
+                if not destination_account_id:
+                    errors.append(_('Destination account not found in row %d: %s') % 
+                                  (row_num, destination_number))
+            
+            if errors:
+                continue
+            
+            lines_to_create.append({
+                'bulk_transaction_id': self.id,
+                'account_id': account_id,
+                'destination_account_id': destination_account_id,
+                'amount': amount,
+                'reference': reference,
+                'description': description,
+                'row_number': row_num,
+            })
+        
+        if errors:
+            raise UserError('\n'.join(errors))
+        return lines_to_create
+    
+    def _persist_vals(self, lines_to_create):
+        """Replace the batch lines with the given line values"""
+        self.ensure_one()
+        # A plain DELETE avoids per-record ORM unlink
+        self.env['core_banking.bulk.transaction.line'].flush_model()
+        self.env.cr.execute(
+            "DELETE FROM core_banking_bulk_transaction_line WHERE bulk_transaction_id = %s", (self.id,))
+        self.invalidate_recordset(['bulk_line_ids'])
+        self.modified(['bulk_line_ids'])
+        # Keep the line inserts from triggering tracking on the parent batch
+        return self.env['core_banking.bulk.transaction.line'].with_context(
+            **WITHOUT_TRACKING_CONTEXT).create(lines_to_create)
+    
     def action_process_batch(self):
         """Process all transactions in the batch"""
         self.ensure_one()
@@ -149,38 +240,79 @@ class BulkTransaction(models.Model):
             'processed_by': self.env.user.id,
         })
         
-        success_count = 0
-        failed_count = 0
-        error_messages = []
+        transaction_type = self._get_transaction_type()
+        sign = -1 if self.transaction_type == 'bulk_withdrawal' else 1
+        now = fields.Datetime.now()
+        lines = self.bulk_line_ids
         
-        for line in self.bulk_line_ids:
-            try:
-                # Create transaction based on type
-                transaction_vals = {
-                    'transaction_type': self._get_transaction_type(),
-                    'account_id': line.account_id.id,
-                    'destination_account_id': line.destination_account_id.id if line.destination_account_id else False,
-                    'amount': line.amount if self.transaction_type != 'bulk_withdrawal' else -line.amount,
-                    'currency_id': self.currency_id.id,
-                    'reference': line.reference,
-                    'description': line.description or f'Bulk {self.transaction_type}: {line.reference}',
-                    'bulk_transaction_id': self.id,
-                    'state': 'draft',
-                }
-                
-                transaction = self.env['core_banking.transaction'].create(transaction_vals)
-                transaction.action_post()
-                
-                line.state = 'processed'
-                success_count += 1
-                
-            except Exception as e:
-                line.write({
-                    'state': 'failed',
-                    'error_message': str(e)
-                })
-                failed_count += 1
-                error_messages.append(f'Line {line.row_number}: {str(e)}')
+        # Materialize the line values up front so the loop works on plain dicts
+        # and is not affected by cache invalidation from the writes below
+        line_data = lines.read(['account_id', 'destination_account_id', 'amount', 'reference',
+                                'description', 'row_number'], load=None)
+        account_ids = {data['account_id'] for data in line_data}
+        # Lock every account the batch moves before reading the balances it is checked against
+        self.env['core_banking.account'].browse(account_ids | {
+            data['destination_account_id'] for data in line_data if data['destination_account_id']
+        })._lock_balances()
+        available = {
+            data['id']: data['available_balance']
+            for data in self.env['core_banking.account'].browse(account_ids).read(['available_balance'])
+        }
+        currency_id = self.currency_id.id
+        user_id = self.env.user.id
+        
+        # Validate every line against a running available balance, then post all
+        # valid lines with one create and one balance UPDATE
+        deltas = defaultdict(float)
+        transaction_vals_list = []
+        processed_line_ids = []
+        failed_lines = []
+        
+        for data in line_data:
+            account_id = data['account_id']
+            destination_id = data['destination_account_id']
+            amount = sign * data['amount']
+            if amount < 0 and abs(amount) > available[account_id]:
+                failed_lines.append((data, _('Insufficient available balance. Available: %s, Required: %s') %
+                                     (available[account_id], abs(amount))))
+                continue
+            
+            available[account_id] += amount
+            deltas[account_id] += amount
+            if transaction_type == 'transfer' and destination_id:
+                deltas[destination_id] += abs(amount)
+                if destination_id in available:
+                    available[destination_id] += abs(amount)
+            
+            transaction_vals_list.append({
+                'transaction_type': transaction_type,
+                'account_id': account_id,
+                'destination_account_id': destination_id or False,
+                'amount': amount,
+                'currency_id': currency_id,
+                'reference': data['reference'],
+                'description': data['description'] or f'Bulk {self.transaction_type}: {data["reference"]}',
+                'bulk_transaction_id': self.id,
+                'state': 'posted',
+                'posted_by': user_id,
+                'posted_date': now,
+                'transaction_date': now,
+            })
+            processed_line_ids.append(data['id'])
+        
+        if transaction_vals_list:
+            # The bulk lines already record each posting, so skip mail tracking
+            transactions = self.env['core_banking.transaction']._without_tracking().create(
+                transaction_vals_list)
+            self.env['core_banking.account']._apply_balance_deltas(deltas, when=now)
+            self._sql_mark_lines_processed(processed_line_ids, transactions.ids)
+        
+        error_messages = [f'Line {data["row_number"]}: {message}' for data, message in failed_lines]
+        self._sql_mark_lines_failed([data['id'] for data, message in failed_lines],
+                                    [message for data, message in failed_lines])
+        
+        success_count = len(processed_line_ids)
+        failed_count = len(failed_lines)
         
         # Update batch status
         self.write({
@@ -191,15 +323,39 @@ class BulkTransaction(models.Model):
             'state': 'completed' if failed_count == 0 else 'failed'
         })
     
+    def _sql_mark_lines_processed(self, line_ids, transaction_ids):
+        """Flag lines as processed and link their transactions in one UPDATE"""
+        if not line_ids:
+            return
+        Line = self.env['core_banking.bulk.transaction.line']
+        Line.flush_model(['state', 'transaction_id'])
+        self.env.cr.execute("""
+            UPDATE core_banking_bulk_transaction_line AS line
+               SET state = 'processed',
+                   transaction_id = processed.transaction_id
+              FROM unnest(%s::int[], %s::int[]) AS processed(id, transaction_id)
+             WHERE line.id = processed.id
+        """, (line_ids, transaction_ids))
+        Line.browse(line_ids).invalidate_recordset(['state', 'transaction_id'])
+    
+    def _sql_mark_lines_failed(self, line_ids, messages):
+        """Flag lines as failed with their error messages in one UPDATE"""
+        if not line_ids:
+            return
+        Line = self.env['core_banking.bulk.transaction.line']
+        Line.flush_model(['state', 'error_message'])
+        self.env.cr.execute("""
+            UPDATE core_banking_bulk_transaction_line AS line
+               SET state = 'failed',
+                   error_message = failed.message
+              FROM unnest(%s::int[], %s::text[]) AS failed(id, message)
+             WHERE line.id = failed.id
+        """, (line_ids, messages))
+        Line.browse(line_ids).invalidate_recordset(['state', 'error_message'])
+    
     def _get_transaction_type(self):
         """Map bulk transaction type to individual transaction type"""
-        mapping = {
-            'bulk_transfer': 'transfer',
-            'salary_payment': 'deposit',
-            'bulk_deposit': 'deposit',
-            'bulk_withdrawal': 'withdrawal',
-        }
-        return mapping.get(self.transaction_type, 'other')
+        return BULK_TRANSACTION_TYPES.get(self.transaction_type, 'other')
 
 
 class BulkTransactionLine(models.Model):
@@ -255,7 +411,7 @@ class ScheduledTransaction(models.Model):
     description = fields.Text(string='Description')
     
     # Scheduling
-    scheduled_date = fields.Datetime(string='Scheduled Date', required=True)
+    scheduled_date = fields.Datetime(string='Scheduled Date', required=True, index=True)
     auto_process = fields.Boolean(string='Auto Process', default=True)
     
     # Status
@@ -264,7 +420,7 @@ class ScheduledTransaction(models.Model):
         ('processed', 'Processed'),
         ('failed', 'Failed'),
         ('cancelled', 'Cancelled')
-    ], string='Status', default='scheduled', tracking=True)
+    ], string='Status', default='scheduled', tracking=True, index=True)
     
     # Processing
     processed_date = fields.Datetime(string='Processed Date')
@@ -279,35 +435,48 @@ class ScheduledTransaction(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.scheduled.transaction') or 'New'
         return super().create(vals_list)
     
-    def action_process_now(self):
+    def init(self):
+        # Partial index matching the scheduled transaction cron predicate
+        create_index(self.env.cr, 'core_banking_scheduled_transaction_due_idx', self._table,
+                     ['scheduled_date'], where="state = 'scheduled' AND auto_process")
+    
+    def _prepare_transaction_vals(self, now):
+        """Values of the core banking transaction created for this schedule"""
+        self.ensure_one()
+        return {
+            'transaction_type': self.transaction_type,
+            'account_id': self.account_id.id,
+            'destination_account_id': self.destination_account_id.id if self.destination_account_id else False,
+            'amount': self.amount if self.transaction_type != 'withdrawal' else -self.amount,
+            'currency_id': self.currency_id.id,
+            'reference': self.reference or self.name,
+            'description': self.description or f'Scheduled {self.transaction_type}: {self.name}',
+            'transaction_date': now,
+            'state': 'draft',
+        }
+    
+    def _mark_processed(self, transactions, now):
+        """Flag the schedules as processed and link them to their transactions"""
+        self.write({
+            'state': 'processed',
+            'processed_date': now,
+        })
+        for scheduled, transaction in zip(self, transactions):
+            scheduled.transaction_id = transaction
+    
+    def action_process_now(self, now=None):
         """Process scheduled transaction immediately"""
         self.ensure_one()
+        now = now or fields.Datetime.now()
         
         if self.state != 'scheduled':
             raise UserError(_('Only scheduled transactions can be processed'))
         
         try:
             # Create the actual transaction
-            transaction_vals = {
-                'transaction_type': self.transaction_type,
-                'account_id': self.account_id.id,
-                'destination_account_id': self.destination_account_id.id if self.destination_account_id else False,
-                'amount': self.amount if self.transaction_type != 'withdrawal' else -self.amount,
-                'currency_id': self.currency_id.id,
-                'reference': self.reference or self.name,
-                'description': self.description or f'Scheduled {self.transaction_type}: {self.name}',
-                'transaction_date': fields.Datetime.now(),
-                'state': 'draft',
-            }
-            
-            transaction = self.env['core_banking.transaction'].create(transaction_vals)
+            transaction = self.env['core_banking.transaction'].create(self._prepare_transaction_vals(now))
             transaction.action_post()
-            
-            self.write({
-                'state': 'processed',
-                'processed_date': fields.Datetime.now(),
-                'transaction_id': transaction.id
-            })
+            self._mark_processed(transaction, now)
             
         except Exception as e:
             self.write({
@@ -319,18 +488,47 @@ class ScheduledTransaction(models.Model):
     @api.model
     def _cron_process_scheduled_transactions(self):
         """Cron job to process due scheduled transactions"""
+        now = fields.Datetime.now()
         due_transactions = self.search([
             ('state', '=', 'scheduled'),
             ('auto_process', '=', True),
-            ('scheduled_date', '<=', fields.Datetime.now())
+            ('scheduled_date', '<=', now)
         ])
+        if not due_transactions:
+            return
         
-        for transaction in due_transactions:
-            try:
-                transaction.action_process_now()
-            except Exception as e:
-                # Log error but continue processing other transactions
-                transaction.write({
-                    'state': 'failed',
-                    'error_message': str(e)
-                })
+        # Skip mail tracking on the transactions created by the cron
+        Transaction = self.env['core_banking.transaction']._without_tracking()
+        due_transactions = due_transactions.with_context(Transaction.env.context)
+        
+        failed = []
+        try:
+            # Create and post the whole batch at once
+            with self.env.cr.savepoint():
+                transactions = Transaction.create([
+                    scheduled._prepare_transaction_vals(now) for scheduled in due_transactions
+                ])
+                transactions.action_post()
+            processed = due_transactions
+        except Exception:
+            # Replay one by one so a single failure only fails its own schedule
+            processed_ids, transaction_ids = [], []
+            for scheduled in due_transactions:
+                try:
+                    with self.env.cr.savepoint():
+                        transaction = Transaction.create(scheduled._prepare_transaction_vals(now))
+                        transaction.action_post()
+                    processed_ids.append(scheduled.id)
+                    transaction_ids.append(transaction.id)
+                except Exception as e:
+                    # Log error but continue processing other transactions
+                    failed.append((scheduled, str(e)))
+            processed = due_transactions.browse(processed_ids)
+            transactions = Transaction.browse(transaction_ids)
+        
+        processed._mark_processed(transactions, now)
+        for scheduled, message in failed:
+            scheduled.write({
+                'state': 'failed',
+                'error_message': message
+            })
@@ -1,5 +1,6 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.sql import create_index
 from datetime import date, datetime
 
 class Customer(models.Model):
@@ -7,27 +8,28 @@ class Customer(models.Model):
     _description = 'Banking Customer'
     _inherit = ['mail.thread', 'mail.activity.mixin']
     _order = 'name'
+    _rec_names_search = ['name', 'ref']
 
     # Basic Information
-    name = fields.Char(string='Full Name', required=True, tracking=True)
+    name = fields.Char(string='Full Name', required=True)
     ref = fields.Char(string='Customer ID', readonly=True, copy=False, index=True, default='New')
     customer_type = fields.Selection([
         ('individual', 'Individual'),
         ('group', 'Group'),
         ('sme', 'SME'),
         ('corporate', 'Corporate')
-    ], string='Customer Type', required=True, default='individual', tracking=True)
+    ], string='Customer Type', required=True, default='individual', tracking=True, index=True)
     
     # Contact Information
-    email = fields.Char(string='Email', tracking=True)
-    phone = fields.Char(string='Phone', tracking=True)
-    mobile = fields.Char(string='Mobile', tracking=True)
+    email = fields.Char(string='Email')
+    phone = fields.Char(string='Phone')
+    mobile = fields.Char(string='Mobile')
     street = fields.Char(string='Street')
     street2 = fields.Char(string='Street2')
     city = fields.Char(string='City')
-    state_id = fields.Many2one('res.country.state', string='State')
+    state_id = fields.Many2one('res.country.state', string='State', index='btree_not_null')
     zip = fields.Char(string='ZIP')
-    country_id = fields.Many2one('res.country', string='Country')
+    country_id = fields.Many2one('res.country', string='Country', prefetch=False, index='btree_not_null')
     
     # KYC Information
     date_of_birth = fields.Date(string='Date of Birth')
@@ -36,7 +38,7 @@ class Customer(models.Model):
         ('female', 'Female'),
         ('other', 'Other')
     ], string='Gender')
-    nationality = fields.Many2one('res.country', string='Nationality')
+    nationality = fields.Many2one('res.country', string='Nationality', prefetch=False, index='btree_not_null')
     id_type = fields.Selection([
         ('national_id', 'National ID'),
         ('passport', 'Passport'),
@@ -47,10 +49,10 @@ class Customer(models.Model):
     id_expiry_date = fields.Date(string='ID Expiry Date')
     
     # Additional Information
-    customer_segment_id = fields.Many2one('core_banking.customer.segment', string='Customer Segment', ondelete='set null')
+    customer_segment_id = fields.Many2one('core_banking.customer.segment', string='Customer Segment', ondelete='set null', prefetch=False, index='btree_not_null')
     is_pep = fields.Boolean(string='Politically Exposed Person (PEP)')
     is_high_risk = fields.Boolean(string='High Risk Customer')
-    notes = fields.Text(string='Internal Notes')
+    notes = fields.Text(string='Internal Notes', prefetch=False)
     
     # Status Information
     state = fields.Selection([
@@ -59,13 +61,13 @@ class Customer(models.Model):
         ('active', 'Active'),
         ('suspended', 'Suspended'),
         ('closed', 'Closed')
-    ], string='Status', default='draft', tracking=True)
+    ], string='Status', default='draft', tracking=True, index=True)
     
     # Related Fields
-    user_id = fields.Many2one('res.users', string='Related User', ondelete='set null')
+    user_id = fields.Many2one('res.users', string='Related User', ondelete='set null', index='btree_not_null')
     company_id = fields.Many2one('res.company', string='Company', default=lambda self: self.env.company, ondelete='restrict')
-    branch_id = fields.Many2one('core_banking.branch', string='Branch', ondelete='set null')
-    relationship_manager_id = fields.Many2one('res.users', string='Relationship Manager', ondelete='set null')
+    branch_id = fields.Many2one('core_banking.branch', string='Branch', ondelete='set null', index='btree_not_null')
+    relationship_manager_id = fields.Many2one('res.users', string='Relationship Manager', ondelete='set null', index='btree_not_null')
     
     # Document Management
     document_ids = fields.One2many('core_banking.customer.document', 'customer_id', string='Documents')
@@ -79,37 +81,57 @@ class Customer(models.Model):
     total_balance = fields.Monetary(string='Total Balance', compute='_compute_total_balance', store=True)
     currency_id = fields.Many2one('res.currency', related='company_id.currency_id', store=True)
     
-    # Audit Fields
-    created_by = fields.Many2one('res.users', string='Created By', default=lambda self: self.env.user, ondelete='set null')
-    created_date = fields.Datetime(string='Created On', default=fields.Datetime.now)
-    last_updated = fields.Datetime(string='Last Updated', default=fields.Datetime.now)
+    def init(self):
+        # Serves the top customers by balance (ORDER BY total_balance DESC NULLS LAST LIMIT n)
+        create_index(self.env.cr, 'core_banking_customer_total_balance_idx', self._table,
+                     ['total_balance DESC NULLS LAST'])
     
     @api.depends('date_of_birth')
     def _compute_age(self):
         today = date.today()
+        # Fetch the birth dates of saved customers in a single query
+        saved = self.filtered('id')
+        birth_dates = {}
+        if saved:
+            saved.flush_recordset(['date_of_birth'])
+            self.env.cr.execute(
+                "SELECT id, date_of_birth FROM core_banking_customer WHERE id = ANY(%s)",
+                [saved.ids],
+            )
+            birth_dates = dict(self.env.cr.fetchall())
         for customer in self:
-            if customer.date_of_birth:
-                dob = fields.Date.from_string(customer.date_of_birth)
+            dob = birth_dates.get(customer.id) if customer.id else customer.date_of_birth
+            if dob:
                 customer.age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
             else:
                 customer.age = 0
     
     @api.depends('account_ids.balance')
     def _compute_total_balance(self):
+        # Aggregate saved customers in the database instead of loading every account
+        saved = self.filtered('id')
+        totals = {}
+        if saved:
+            groups = self.env['core_banking.account']._read_group(
+                [('customer_id', 'in', saved.ids)],
+                ['customer_id'],
+                ['balance:sum'],
+            )
+            totals = {customer.id: balance for customer, balance in groups}
         for customer in self:
-            customer.total_balance = sum(account.balance for account in customer.account_ids)
+            if customer.id:
+                customer.total_balance = totals.get(customer.id, 0.0)
+            else:
+                customer.total_balance = sum(customer.account_ids.mapped('balance'))
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('ref', 'New') == 'New':
-                vals['ref'] = self.env['ir.sequence'].next_by_code('core_banking.customer') or 'New'
+        to_ref = [vals for vals in vals_list if vals.get('ref', 'New') == 'New']
+        refs = self.env['ir.sequence']._next_by_code_batch('core_banking.customer', len(to_ref))
+        for vals, ref in zip(to_ref, refs):
+            vals['ref'] = ref or 'New'
         return super().create(vals_list)
     
-    def write(self, vals):
-        vals['last_updated'] = fields.Datetime.now()
-        return super().write(vals)
-    
     def action_verify(self):
         self.write({'state': 'verified'})
     
@@ -120,16 +142,30 @@ class Customer(models.Model):
         self.write({'state': 'suspended'})
     
     def action_close(self):
-        if any(account.balance != 0 for account in self.account_ids):
+        self.env['core_banking.account'].flush_model(['customer_id', 'balance'])
+        self.env.cr.execute(
+            "SELECT 1 FROM core_banking_account WHERE customer_id = ANY(%s) AND balance <> 0 LIMIT 1",
+            [self.ids],
+        )
+        if self.env.cr.fetchone():
             raise UserError(_('Cannot close customer with non-zero account balances'))
         self.write({'state': 'closed'})
     
-    def name_get(self):
-        result = []
+    @api.depends('ref', 'name')
+    def _compute_display_name(self):
+        # Read only the label columns of saved customers instead of prefetching the whole row
+        saved = self.filtered('id')
+        labels = {}
+        if saved:
+            saved.flush_recordset(['ref', 'name'])
+            self.env.cr.execute(
+                "SELECT id, ref, name FROM core_banking_customer WHERE id = ANY(%s)",
+                [saved.ids],
+            )
+            labels = {customer_id: (ref, name) for customer_id, ref, name in self.env.cr.fetchall()}
         for customer in self:
-            name = f"{customer.ref} - {customer.name}" if customer.ref else customer.name
-            result.append((customer.id, name))
-        return result
+            ref, name = labels.get(customer.id, (False, '')) if customer.id else (customer.ref, customer.name)
+            customer.display_name = f"{ref} - {name}" if ref else name
 
 
 class CustomerDocument(models.Model):
@@ -138,7 +174,7 @@ class CustomerDocument(models.Model):
     _order = 'date_uploaded desc'
     
     name = fields.Char(string='Document Name', required=True)
-    customer_id = fields.Many2one('core_banking.customer', string='Customer', ondelete='cascade')
+    customer_id = fields.Many2one('core_banking.customer', string='Customer', ondelete='cascade', index='btree_not_null')
     document_type = fields.Selection([
         ('id_proof', 'ID Proof'),
         ('address_proof', 'Address Proof'),
@@ -1,9 +1,39 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from datetime import date, datetime, timedelta
 import calendar
+from collections import defaultdict
+from math import expm1, log1p
+
+# Maturity amount for each interest compounding option, from the principal,
+# the annual rate (as a fraction) and the term in months
+MATURITY_AMOUNT_FORMULAS = {
+    'simple': lambda principal, rate, months: principal * (1 + rate * months / 12),
+    'monthly': lambda principal, rate, months: principal * (1 + rate / 12) ** months,
+    'quarterly': lambda principal, rate, months: principal * (1 + rate / 4) ** (months / 3),
+    'annual': lambda principal, rate, months: principal * (1 + rate) ** (months / 12),
+}
+
+# Interest accrued after a number of days, from the principal and the annual
+# rate; anything but simple interest is compounded daily
+ACCRUED_INTEREST_FORMULAS = {
+    'simple': lambda principal, rate, days: principal * rate * days / 365,
+}
+
+
+def _accrued_compound_interest(principal, rate, days):
+    # (1 + r) ** n - 1 evaluated as expm1(n * log1p(r))
+    return principal * expm1(days * log1p(rate / 365))
+
+
+def add_months(start, months):
+    """Add a number of months to a date, clamping the day to the end of the month"""
+    year, month = divmod(start.month - 1 + months, 12)
+    year += start.year
+    month += 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
 
 class FixedDeposit(models.Model):
     _name = 'core_banking.fixed.deposit'
@@ -13,16 +43,16 @@ class FixedDeposit(models.Model):
     
     name = fields.Char(string='FD Reference', required=True, readonly=True, default='New')
     customer_id = fields.Many2one('core_banking.customer', string='Customer', required=True, 
-                                 ondelete='restrict', tracking=True)
+                                 ondelete='restrict', tracking=True, index=True)
     account_id = fields.Many2one('core_banking.account', string='Linked Account', required=True,
-                               ondelete='restrict', tracking=True)
+                               ondelete='restrict', tracking=True, index=True)
     
     # Deposit Details
-    principal_amount = fields.Monetary(string='Principal Amount', required=True, tracking=True)
+    principal_amount = fields.Monetary(string='Principal Amount', required=True)
     currency_id = fields.Many2one('res.currency', string='Currency', required=True,
                                  default=lambda self: self.env.company.currency_id)
-    interest_rate = fields.Float(string='Interest Rate (% p.a.)', required=True, tracking=True)
-    term_months = fields.Integer(string='Term (Months)', required=True, tracking=True)
+    interest_rate = fields.Float(string='Interest Rate (% p.a.)', required=True)
+    term_months = fields.Integer(string='Term (Months)', required=True)
     
     # Dates
     deposit_date = fields.Date(string='Deposit Date', default=fields.Date.context_today, required=True)
@@ -45,8 +75,8 @@ class FixedDeposit(models.Model):
     
     # Computed Fields
     maturity_amount = fields.Monetary(string='Maturity Amount', compute='_compute_maturity_amount', store=True)
-    accrued_interest = fields.Monetary(string='Accrued Interest', compute='_compute_accrued_interest', store=True)
-    current_value = fields.Monetary(string='Current Value', compute='_compute_current_value', store=True)
+    accrued_interest = fields.Monetary(string='Accrued Interest', compute='_compute_accrued_interest')
+    current_value = fields.Monetary(string='Current Value', compute='_compute_current_value')
     
     # Status
     state = fields.Selection([
@@ -55,7 +85,7 @@ class FixedDeposit(models.Model):
         ('matured', 'Matured'),
         ('withdrawn', 'Withdrawn'),
         ('renewed', 'Renewed')
-    ], string='Status', default='draft', tracking=True)
+    ], string='Status', default='draft', tracking=True, index=True)
     
     # Early Withdrawal
     allow_early_withdrawal = fields.Boolean(string='Allow Early Withdrawal', default=True)
@@ -64,60 +94,52 @@ class FixedDeposit(models.Model):
     # Related
     company_id = fields.Many2one('res.company', string='Company', 
                                 default=lambda self: self.env.company)
-    branch_id = fields.Many2one('core_banking.branch', string='Branch', required=True)
+    branch_id = fields.Many2one('core_banking.branch', string='Branch', required=True, index=True)
     certificate_id = fields.Many2one('core_banking.deposit.certificate', string='Certificate')
     
     @api.depends('deposit_date', 'term_months')
     def _compute_maturity_date(self):
         for deposit in self:
             if deposit.deposit_date and deposit.term_months:
-                deposit.maturity_date = deposit.deposit_date + relativedelta(months=deposit.term_months)
+                deposit.maturity_date = add_months(deposit.deposit_date, deposit.term_months)
             else:
                 deposit.maturity_date = False
     
     @api.depends('principal_amount', 'interest_rate', 'term_months', 'interest_compounding')
     def _compute_maturity_amount(self):
-        for deposit in self:
-            if deposit.principal_amount and deposit.interest_rate and deposit.term_months:
-                principal = deposit.principal_amount
-                rate = deposit.interest_rate / 100
-                months = deposit.term_months
-                
-                if deposit.interest_compounding == 'simple':
-                    interest = principal * rate * months / 12
-                    deposit.maturity_amount = principal + interest
-                else:
-                    # Compound interest calculation
-                    compounding_periods = {
-                        'monthly': 12,
-                        'quarterly': 4,
-                        'annual': 1
-                    }.get(deposit.interest_compounding, 4)
-                    
-                    years = months / 12
-                    compound_rate = 1 + (rate / compounding_periods)
-                    periods = compounding_periods * years
-                    
-                    deposit.maturity_amount = principal * (compound_rate ** periods)
+        # Walk the inputs column by column rather than dereferencing each record
+        columns = zip(
+            self,
+            self.mapped('principal_amount'),
+            self.mapped('interest_rate'),
+            self.mapped('term_months'),
+            self.mapped('interest_compounding'),
+        )
+        default_formula = MATURITY_AMOUNT_FORMULAS['quarterly']
+        for deposit, principal, interest_rate, months, compounding in columns:
+            if principal and interest_rate and months:
+                formula = MATURITY_AMOUNT_FORMULAS.get(compounding, default_formula)
+                deposit.maturity_amount = formula(principal, interest_rate / 100, months)
             else:
                 deposit.maturity_amount = 0.0
     
-    @api.depends('principal_amount', 'interest_rate', 'deposit_date', 'interest_compounding')
+    @api.depends('state', 'principal_amount', 'interest_rate', 'deposit_date', 'interest_compounding')
     def _compute_accrued_interest(self):
         today = fields.Date.context_today(self)
-        for deposit in self:
-            if deposit.state == 'active' and deposit.deposit_date:
-                days_elapsed = (today - deposit.deposit_date).days
+        columns = zip(
+            self,
+            self.mapped('state'),
+            self.mapped('deposit_date'),
+            self.mapped('principal_amount'),
+            self.mapped('interest_rate'),
+            self.mapped('interest_compounding'),
+        )
+        for deposit, state, deposit_date, principal, interest_rate, compounding in columns:
+            if state == 'active' and deposit_date:
+                days_elapsed = (today - deposit_date).days
                 if days_elapsed > 0:
-                    principal = deposit.principal_amount
-                    annual_rate = deposit.interest_rate / 100
-                    
-                    if deposit.interest_compounding == 'simple':
-                        deposit.accrued_interest = principal * annual_rate * days_elapsed / 365
-                    else:
-                        # Simplified daily compounding for accrued interest
-                        daily_rate = annual_rate / 365
-                        deposit.accrued_interest = principal * ((1 + daily_rate) ** days_elapsed - 1)
+                    formula = ACCRUED_INTEREST_FORMULAS.get(compounding, _accrued_compound_interest)
+                    deposit.accrued_interest = formula(principal, interest_rate / 100, days_elapsed)
                 else:
                     deposit.accrued_interest = 0.0
             else:
@@ -125,14 +147,16 @@ class FixedDeposit(models.Model):
     
     @api.depends('principal_amount', 'accrued_interest')
     def _compute_current_value(self):
-        for deposit in self:
-            deposit.current_value = deposit.principal_amount + deposit.accrued_interest
+        columns = zip(self, self.mapped('principal_amount'), self.mapped('accrued_interest'))
+        for deposit, principal, accrued_interest in columns:
+            deposit.current_value = principal + accrued_interest
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.fixed.deposit') or 'New'
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.fixed.deposit', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
         return super().create(vals_list)
     
     def action_activate(self):
@@ -143,16 +167,39 @@ class FixedDeposit(models.Model):
     def action_mature(self):
         """Process maturity of fixed deposit"""
         self.ensure_one()
-        if self.state != 'active':
+        self.action_mature_batch()
+    
+    def action_mature_batch(self):
+        """Process maturity of several fixed deposits at once"""
+        if any(deposit.state != 'active' for deposit in self):
             raise UserError(_('Only active deposits can be matured'))
         
-        # Credit maturity amount to linked account
-        if self.account_id:
-            self.account_id.deposit(
-                self.maturity_amount,
-                reference=f'FD-MAT-{self.name}',
-                description=f'Fixed Deposit Maturity: {self.name}'
-            )
+        # Credit maturity amounts to the linked accounts in one pass
+        now = fields.Datetime.now()
+        deltas = defaultdict(float)
+        vals_list = []
+        to_credit = self.filtered('account_id')
+        names = to_credit.mapped('name')
+        references = [f'FD-MAT-{name}' for name in names]
+        descriptions = [f'Fixed Deposit Maturity: {name}' for name in names]
+        for deposit, reference, description in zip(to_credit, references, descriptions):
+            if deposit.maturity_amount <= 0:
+                raise UserError(_('Deposit amount must be positive'))
+            deltas[deposit.account_id.id] += deposit.maturity_amount
+            vals_list.append({
+                'account_id': deposit.account_id.id,
+                'transaction_type': 'deposit',
+                'amount': deposit.maturity_amount,
+                'reference': reference,
+                'description': description,
+                'state': 'posted',
+                'transaction_date': now,
+            })
+        if vals_list:
+            # Lock the credited accounts first, like every other posting path
+            to_credit.account_id._lock_balances()
+            self.env['core_banking.transaction'].create(vals_list)
+            self.env['core_banking.account']._apply_balance_deltas(deltas, when=now)
         
         self.write({'state': 'matured'})
     
@@ -187,15 +234,26 @@ class FixedDeposit(models.Model):
         }
     
     def generate_certificate(self):
-        """Generate deposit certificate"""
-        self.ensure_one()
-        if not self.certificate_id:
-            certificate = self.env['core_banking.deposit.certificate'].create({
-                'deposit_id': self.id,
-                'certificate_number': self.env['ir.sequence'].next_by_code('core_banking.deposit.certificate') or 'CERT-NEW',
-                'issue_date': fields.Date.context_today(self),
-            })
-            self.certificate_id = certificate.id
+        """Generate deposit certificates"""
+        to_certify = self.filtered(lambda deposit: not deposit.certificate_id)
+        if not to_certify:
+            return
+        
+        numbers = self.env['ir.sequence']._next_by_code_batch('core_banking.deposit.certificate', len(to_certify))
+        issue_date = fields.Date.context_today(self)
+        certificates = self.env['core_banking.deposit.certificate'].create([{
+            'deposit_id': deposit.id,
+            'certificate_number': number or 'CERT-NEW',
+            'issue_date': issue_date,
+            'customer_name': deposit.customer_id.name,
+            'principal_amount': deposit.principal_amount,
+            'interest_rate': deposit.interest_rate,
+            'maturity_date': deposit.maturity_date,
+            'maturity_amount': deposit.maturity_amount,
+            'currency_id': deposit.currency_id.id,
+        } for deposit, number in zip(to_certify, numbers)])
+        for deposit, certificate in zip(to_certify, certificates):
+            deposit.certificate_id = certificate
 
 
 class DepositCertificate(models.Model):
@@ -203,17 +261,21 @@ class DepositCertificate(models.Model):
     _description = 'Deposit Certificate'
     
     certificate_number = fields.Char(string='Certificate Number', required=True)
-    deposit_id = fields.Many2one('core_banking.fixed.deposit', string='Fixed Deposit', required=True)
+    deposit_id = fields.Many2one('core_banking.fixed.deposit', string='Fixed Deposit', required=True, index=True)
     issue_date = fields.Date(string='Issue Date', required=True)
     issued_by = fields.Many2one('res.users', string='Issued By', default=lambda self: self.env.user)
     
-    # Certificate Details (computed from deposit)
-    customer_name = fields.Char(string='Customer Name', related='deposit_id.customer_id.name', store=True)
-    principal_amount = fields.Monetary(string='Principal Amount', related='deposit_id.principal_amount', store=True)
-    interest_rate = fields.Float(string='Interest Rate', related='deposit_id.interest_rate', store=True)
-    maturity_date = fields.Date(string='Maturity Date', related='deposit_id.maturity_date', store=True)
-    maturity_amount = fields.Monetary(string='Maturity Amount', related='deposit_id.maturity_amount', store=True)
-    currency_id = fields.Many2one('res.currency', related='deposit_id.currency_id', store=True)
+    # Certificate Details (copied from the deposit when issued)
+    customer_name = fields.Char(string='Customer Name')
+    principal_amount = fields.Monetary(string='Principal Amount')
+    interest_rate = fields.Float(string='Interest Rate')
+    maturity_date = fields.Date(string='Maturity Date')
+    maturity_amount = fields.Monetary(string='Maturity Amount')
+    currency_id = fields.Many2one('res.currency', string='Currency')
+    
+    _sql_constraints = [
+        ('certificate_number_uniq', 'unique (certificate_number)', 'Certificate number must be unique!'),
+    ]
 
 
 class TermDeposit(models.Model):
@@ -1,9 +1,29 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.sql import create_index
+from datetime import timedelta
+import base64
 import hashlib
+import json
+import os
 import secrets
-import uuid
+import time
+from collections import Counter
+
+# How long a mobile banking session stays valid after its last activity
+SESSION_LIFETIME = timedelta(hours=24)
+
+# Shared encoder for QR payloads: compact, with a stable key order
+QR_PAYLOAD_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+# Above this many requests per minute, services are limited with two
+# counters per window instead of counting every recent transaction
+RATE_LIMIT_COUNTER_THRESHOLD = 1000
+
+# Lengths in seconds of the windows services are rate limited over
+RATE_LIMIT_WINDOWS = (60, 3600)
+
 
 class DigitalBankingService(models.Model):
     _name = 'core_banking.digital.service'
@@ -41,6 +61,102 @@ class DigitalBankingService(models.Model):
     
     # Related
     api_key_ids = fields.One2many('core_banking.api.key', 'service_id', string='API Keys')
+    
+    def _check_rate_limit(self, api_key_id, count=1):
+        """Whether ``count`` more requests with the API key fit the service rate limits
+        
+        Requests are the digital transactions submitted with the key, counted over
+        rolling one minute and one hour windows, so the limits hold across workers
+        and requests that were rolled back are not counted.
+        
+        :return: whether the requests are allowed
+        """
+        self.ensure_one()
+        if not self.rate_limit_enabled:
+            return True
+        
+        if self.requests_per_minute > RATE_LIMIT_COUNTER_THRESHOLD:
+            return self._check_rate_limit_counters(api_key_id, count)
+        
+        now = fields.Datetime.now()
+        self.env['core_banking.digital.transaction'].flush_model(['api_key_id'])
+        self.env.cr.execute("""
+            SELECT COUNT(*) FILTER (WHERE create_date >= %s), COUNT(*)
+              FROM core_banking_digital_transaction
+             WHERE api_key_id = %s
+               AND create_date >= %s
+        """, (now - timedelta(minutes=1), api_key_id, now - timedelta(hours=1)))
+        last_minute, last_hour = self.env.cr.fetchone()
+        return (last_minute + count <= self.requests_per_minute
+                and last_hour + count <= self.requests_per_hour)
+    
+    def _check_rate_limit_counters(self, api_key_id, count=1):
+        """Constant memory variant of :meth:`_check_rate_limit` for busy services
+        
+        The requests of a rolling window are estimated from the counts of the
+        current and the previous fixed window, see core_banking.rate.limit.counter.
+        """
+        now = time.time()
+        counts = self.env['core_banking.rate.limit.counter']._increment(self.id, api_key_id, count, now)
+        limits = {60: self.requests_per_minute, 3600: self.requests_per_hour}
+        for length, (current, previous) in counts.items():
+            # Weight the previous window by the share of it still inside the rolling one
+            weight = 1 - (now % length) / length
+            if previous * weight + current > limits[length]:
+                return False
+        return True
+
+
+class RateLimitCounter(models.Model):
+    _name = 'core_banking.rate.limit.counter'
+    _description = 'Rate Limit Counter'
+    _log_access = False
+    
+    service_id = fields.Many2one('core_banking.digital.service', string='Service',
+                                 required=True, ondelete='cascade')
+    api_key_id = fields.Many2one('core_banking.api.key', string='API Key',
+                                 required=True, ondelete='cascade')
+    window_length = fields.Integer(string='Window Length (seconds)', required=True)
+    window_start = fields.Float(string='Window Start', required=True)
+    current_count = fields.Integer(string='Current Window Requests', default=0)
+    previous_count = fields.Integer(string='Previous Window Requests', default=0)
+    
+    _sql_constraints = [
+        ('window_uniq', 'unique (service_id, api_key_id, window_length)',
+         'A key has one counter per service and window length!'),
+    ]
+    
+    @api.model
+    def _increment(self, service_id, api_key_id, count, now):
+        """Add ``count`` requests to the key's counters of every window length
+        
+        Counters roll over to a new fixed window in the same statement, so the
+        increment is atomic across workers and undone if the request rolls back.
+        
+        :return: {window length: (current count, previous count)}
+        """
+        self.flush_model()
+        self.env.cr.execute("""
+            INSERT INTO core_banking_rate_limit_counter AS counter
+                   (service_id, api_key_id, window_length, window_start, current_count, previous_count)
+            SELECT %s, %s, length, floor(%s / length) * length, %s, 0
+              FROM unnest(%s::int[]) AS length
+                ON CONFLICT (service_id, api_key_id, window_length) DO UPDATE
+               SET previous_count = CASE
+                       WHEN counter.window_start = EXCLUDED.window_start THEN counter.previous_count
+                       WHEN counter.window_start = EXCLUDED.window_start - counter.window_length
+                           THEN counter.current_count
+                       ELSE 0
+                   END,
+                   current_count = CASE
+                       WHEN counter.window_start = EXCLUDED.window_start THEN counter.current_count
+                       ELSE 0
+                   END + EXCLUDED.current_count,
+                   window_start = EXCLUDED.window_start
+            RETURNING window_length, current_count, previous_count
+        """, (service_id, api_key_id, now, count, list(RATE_LIMIT_WINDOWS)))
+        self.invalidate_model()
+        return {length: (current, previous) for length, current, previous in self.env.cr.fetchall()}
 
 
 class APIKey(models.Model):
@@ -75,20 +191,39 @@ class APIKey(models.Model):
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            # Generate API key and secret
-            vals['api_key'] = self._generate_api_key()
-            vals['secret_key'] = self._generate_secret_key()
+        # Generate API keys and secrets from one draw of random material
+        api_blob = secrets.token_hex(16 * len(vals_list))
+        secret_blob = secrets.token_bytes(32 * len(vals_list))
+        for index, vals in enumerate(vals_list):
+            vals['api_key'] = f"cbk_{api_blob[index * 32:(index + 1) * 32]}"
+            vals['secret_key'] = base64.urlsafe_b64encode(
+                secret_blob[index * 32:(index + 1) * 32]
+            ).rstrip(b'=').decode()
         return super().create(vals_list)
     
     def _generate_api_key(self):
         """Generate a unique API key"""
-        return f"cbk_{uuid.uuid4().hex}"
+        return f"cbk_{secrets.token_hex(16)}"
     
     def _generate_secret_key(self):
         """Generate a secret key"""
         return secrets.token_urlsafe(32)
     
+    def _check_rate_limit(self):
+        """Raise if the requests made with these keys exceed their service rate limits
+        
+        A key listed several times counts as that many requests. Stamping the keys
+        as used locks them, so concurrent requests with the same key are counted
+        one after the other.
+        """
+        requests = Counter(self.ids)
+        api_keys = self.browse(sorted(requests)).sudo()
+        api_keys.write({'last_used_date': fields.Datetime.now()})
+        api_keys.flush_recordset(['last_used_date'])
+        for api_key in api_keys:
+            if not api_key.service_id._check_rate_limit(api_key.id, requests[api_key.id]):
+                raise UserError(_('Rate limit exceeded for API key %s') % api_key.name)
+    
     def action_regenerate_keys(self):
         """Regenerate API key and secret"""
         self.ensure_one()
@@ -106,7 +241,7 @@ class MobileBankingSession(models.Model):
     _name = 'core_banking.mobile.session'
     _description = 'Mobile Banking Session'
     
-    session_id = fields.Char(string='Session ID', required=True, index=True)
+    session_id = fields.Char(string='Session ID', required=True)
     customer_id = fields.Many2one('core_banking.customer', string='Customer', required=True)
     device_id = fields.Char(string='Device ID')
     device_type = fields.Selection([
@@ -135,12 +270,29 @@ class MobileBankingSession(models.Model):
     ], string='Auth Method')
     
     two_factor_verified = fields.Boolean(string='2FA Verified', default=False)
+    expiry_at = fields.Datetime(string='Expires At', compute='_compute_expiry_at', store=True)
+    
+    _sql_constraints = [
+        ('session_id_uniq', 'unique (session_id)', 'Session ID must be unique!'),
+    ]
+    
+    def init(self):
+        # Partial index matching the expired session cleanup predicate
+        create_index(self.env.cr, 'core_banking_mobile_session_expiry_idx', self._table,
+                     ['expiry_at'], where='is_active')
+    
+    @api.depends('last_activity')
+    def _compute_expiry_at(self):
+        for session in self:
+            session.expiry_at = session.last_activity + SESSION_LIFETIME if session.last_activity else False
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if not vals.get('session_id'):
-                vals['session_id'] = str(uuid.uuid4())
+        # Draw the random material of all missing session ids at once
+        to_identify = [vals for vals in vals_list if not vals.get('session_id')]
+        raw = os.urandom(16 * len(to_identify)).hex()
+        for index, vals in enumerate(to_identify):
+            vals['session_id'] = raw[index * 32:(index + 1) * 32]
         return super().create(vals_list)
     
     def action_logout(self):
@@ -151,14 +303,36 @@ class MobileBankingSession(models.Model):
         })
     
     @api.model
-    def cleanup_expired_sessions(self):
-        """Cleanup expired sessions"""
-        timeout = fields.Datetime.now() - timedelta(hours=24)
-        expired_sessions = self.search([
-            ('is_active', '=', True),
-            ('last_activity', '<', timeout)
-        ])
-        expired_sessions.action_logout()
+    def cleanup_expired_sessions(self, batch_size=5000, auto_commit=False):
+        """Cleanup expired sessions, ``batch_size`` rows per statement
+        
+        :param auto_commit: commit after every batch to keep transactions short,
+                            only meant for the cron job
+        """
+        now = fields.Datetime.now()
+        self.flush_model(['is_active', 'expiry_at', 'logout_time'])
+        while True:
+            self.env.cr.execute("""
+                UPDATE core_banking_mobile_session AS session
+                   SET is_active = false,
+                       logout_time = %s
+                  FROM (SELECT id FROM core_banking_mobile_session
+                         WHERE is_active AND expiry_at < %s
+                         LIMIT %s
+                           FOR UPDATE SKIP LOCKED) AS expired
+                 WHERE session.id = expired.id
+            """, (now, now, batch_size))
+            done = self.env.cr.rowcount < batch_size
+            self.invalidate_model(['is_active', 'logout_time'])
+            if auto_commit:
+                self.env.cr.commit()
+            if done:
+                break
+    
+    @api.model
+    def _cron_cleanup_expired_sessions(self):
+        """Cron job to log out expired sessions"""
+        self.cleanup_expired_sessions(auto_commit=True)
 
 
 class DigitalTransaction(models.Model):
@@ -183,6 +357,20 @@ class DigitalTransaction(models.Model):
     otp_verified = fields.Boolean(string='OTP Verified', default=False)
     biometric_verified = fields.Boolean(string='Biometric Verified', default=False)
     digital_signature = fields.Text(string='Digital Signature')
+    
+    def init(self):
+        super().init()
+        # Recent transactions per API key back the service rate limits
+        create_index(self.env.cr, 'core_banking_digital_transaction_api_key_date_idx', self._table,
+                     ['api_key_id', 'create_date'], where='api_key_id IS NOT NULL')
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Every transaction submitted with an API key counts as one request
+        self.env['core_banking.api.key'].browse([
+            vals['api_key_id'] for vals in vals_list if vals.get('api_key_id')
+        ])._check_rate_limit()
+        return super().create(vals_list)
 
 
 class CustomerNotification(models.Model):
@@ -226,30 +414,40 @@ class CustomerNotification(models.Model):
     push_content = fields.Text(string='Push Content')
     
     def action_send_notification(self):
-        """Send notification via selected channels"""
-        self.ensure_one()
+        """Send notifications via their selected channels"""
+        # Load the contact details of every customer in one query
+        self.customer_id.fetch(['email', 'mobile'])
+        
+        sent_ids, failed_ids = [], []
+        error = None
+        for notification in self:
+            try:
+                # Send email
+                if notification.send_email and notification.customer_id.email:
+                    notification._send_email()
+                
+                # Send SMS
+                if notification.send_sms and notification.customer_id.mobile:
+                    notification._send_sms()
+                
+                # Send push notification
+                if notification.send_push:
+                    notification._send_push_notification()
+                
+                sent_ids.append(notification.id)
+            except Exception as e:
+                failed_ids.append(notification.id)
+                error = error or e
         
-        try:
-            # Send email
-            if self.send_email and self.customer_id.email:
-                self._send_email()
-            
-            # Send SMS
-            if self.send_sms and self.customer_id.mobile:
-                self._send_sms()
-            
-            # Send push notification
-            if self.send_push:
-                self._send_push_notification()
-            
-            self.write({
+        if sent_ids:
+            self.browse(sent_ids).write({
                 'state': 'sent',
                 'sent_date': fields.Datetime.now()
             })
-            
-        except Exception as e:
-            self.write({'state': 'failed'})
-            raise UserError(_('Failed to send notification: %s') % str(e))
+        if failed_ids:
+            self.browse(failed_ids).write({'state': 'failed'})
+            if len(self) == 1:
+                raise UserError(_('Failed to send notification: %s') % str(error))
     
     def _send_email(self):
         """Send email notification"""
@@ -305,27 +503,33 @@ class QRCodePayment(models.Model):
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.qr.payment') or 'New'
-            
-            # Generate QR code data if not provided
-            if not vals.get('qr_code'):
-                vals['qr_code'] = self._generate_qr_code_data(vals)
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.qr.payment', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
+        
+        # Generate QR code data if not provided
+        to_encode = [vals for vals in vals_list if not vals.get('qr_code')]
+        payloads = [self._prepare_qr_code_payload(vals) for vals in to_encode]
+        for vals, qr_code in zip(to_encode, map(QR_PAYLOAD_ENCODER.encode, payloads)):
+            vals['qr_code'] = qr_code
         
         return super().create(vals_list)
     
-    def _generate_qr_code_data(self, vals):
-        """Generate QR code data"""
+    def _prepare_qr_code_payload(self, vals):
+        """Build the data encoded in the QR code"""
         # Simple QR code format - in real implementation, this would follow
         # standard formats like EMV QR or local standards
-        data = {
+        return {
             'merchant_id': vals.get('merchant_id'),
             'account': vals.get('merchant_account_id'),
             'amount': vals.get('amount', 0),
             'reference': vals.get('name', 'QR-NEW')
         }
-        return str(data)
+    
+    def _generate_qr_code_data(self, vals):
+        """Generate QR code data"""
+        return QR_PAYLOAD_ENCODER.encode(self._prepare_qr_code_payload(vals))
 
 
 class QRPaymentTransaction(models.Model):
@@ -354,15 +558,23 @@ class QRPaymentTransaction(models.Model):
         """Process QR code payment"""
         self.ensure_one()
         
-        # Validate QR code
-        if not self.qr_payment_id.is_active:
-            raise UserError(_('QR code is not active'))
-        
-        if self.qr_payment_id.valid_until and fields.Datetime.now() > self.qr_payment_id.valid_until:
-            raise UserError(_('QR code has expired'))
-        
-        if (self.qr_payment_id.max_uses > 0 and 
-            self.qr_payment_id.current_uses >= self.qr_payment_id.max_uses):
+        # Validate QR code, locking it so concurrent payments see the same usage
+        qr_payment = self.qr_payment_id
+        qr_payment.flush_recordset(['is_active', 'valid_until', 'max_uses', 'current_uses'])
+        self.env.cr.execute("""
+            SELECT COALESCE(is_active, false),
+                   valid_until IS NULL OR valid_until >= %s,
+                   COALESCE(max_uses, 0) <= 0 OR COALESCE(current_uses, 0) < max_uses
+              FROM core_banking_qr_payment
+             WHERE id = %s
+               FOR UPDATE
+        """, (fields.Datetime.now(), qr_payment.id))
+        is_active, is_valid, has_uses_left = self.env.cr.fetchone()
+        if not (is_active and is_valid and has_uses_left):
+            if not is_active:
+                raise UserError(_('QR code is not active'))
+            if not is_valid:
+                raise UserError(_('QR code has expired'))
             raise UserError(_('QR code usage limit exceeded'))
         
         # Create transfer transaction
@@ -379,8 +591,12 @@ class QRPaymentTransaction(models.Model):
         # Post transaction
         transaction.action_post()
         
-        # Update QR payment usage
-        self.qr_payment_id.current_uses += 1
+        # Update QR payment usage in place to avoid a read-modify-write race
+        self.env.cr.execute(
+            "UPDATE core_banking_qr_payment SET current_uses = COALESCE(current_uses, 0) + 1 WHERE id = %s",
+            (qr_payment.id,),
+        )
+        qr_payment.invalidate_recordset(['current_uses'])
         
         # Update transaction reference
         self.transaction_id = transaction.id
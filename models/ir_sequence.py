@@ -0,0 +1,30 @@
+from odoo import models, fields, api, _
+
+class IrSequence(models.Model):
+    _inherit = 'ir.sequence'
+    
+    @api.model
+    def _next_by_code_batch(self, sequence_code, count):
+        """Return the next ``count`` values of the sequence with the given code
+        
+        Standard sequences without date ranges are advanced with a single
+        nextval() round-trip; other sequences fall back to one _next() per value.
+        """
+        if count <= 0:
+            return []
+        
+        sequence = self.search([
+            ('code', '=', sequence_code),
+            ('company_id', 'in', [self.env.company.id, False])
+        ], order='company_id', limit=1)
+        if not sequence:
+            return [False] * count
+        
+        if sequence.implementation == 'standard' and not sequence.use_date_range:
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ('ir_sequence_%03d' % sequence.id, count)
+            )
+            return [sequence.get_next_char(number) for number, in self.env.cr.fetchall()]
+        
+        return [sequence._next() for _ in range(count)]
@@ -2,7 +2,8 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+
+from .deposit import add_months
 
 class Loan(models.Model):
     _name = 'core_banking.loan'
@@ -66,11 +67,19 @@ class Loan(models.Model):
     overdue_days = fields.Integer(string='Days Overdue', compute='_compute_overdue_status', store=True)
     overdue_amount = fields.Monetary(string='Overdue Amount', compute='_compute_overdue_status', store=True)
     
+    def init(self):
+        # Partial covering index so overdue loan lists are served by index-only scans
+        self.env.cr.execute(f"""
+            CREATE INDEX IF NOT EXISTS core_banking_loan_overdue_idx
+                ON {self._table} (id) INCLUDE (overdue_amount, overdue_days)
+             WHERE is_overdue
+        """)
+    
     @api.depends('disbursement_date', 'term_months')
     def _compute_maturity_date(self):
         for loan in self:
             if loan.disbursement_date and loan.term_months:
-                loan.maturity_date = loan.disbursement_date + relativedelta(months=loan.term_months)
+                loan.maturity_date = add_months(loan.disbursement_date, loan.term_months)
             else:
                 loan.maturity_date = False
     
@@ -81,16 +90,20 @@ class Loan(models.Model):
     
     @api.depends('principal_amount', 'interest_rate', 'term_months')
     def _compute_emi_amount(self):
-        for loan in self:
-            if loan.principal_amount and loan.interest_rate and loan.term_months:
+        columns = zip(
+            self,
+            self.mapped('principal_amount'),
+            self.mapped('interest_rate'),
+            self.mapped('term_months'),
+        )
+        for loan, principal, interest_rate, months in columns:
+            if principal and interest_rate and months:
                 # EMI Calculation: P * r * (1+r)^n / ((1+r)^n - 1)
-                principal = loan.principal_amount
-                monthly_rate = loan.interest_rate / 100 / 12
-                months = loan.term_months
+                monthly_rate = interest_rate / 100 / 12
                 
                 if monthly_rate > 0:
-                    emi = principal * monthly_rate * ((1 + monthly_rate) ** months) / (((1 + monthly_rate) ** months) - 1)
-                    loan.emi_amount = emi
+                    growth = (1 + monthly_rate) ** months
+                    loan.emi_amount = principal * monthly_rate * growth / (growth - 1)
                 else:
                     loan.emi_amount = principal / months
             else:
@@ -98,25 +111,61 @@ class Loan(models.Model):
     
     @api.depends('payment_ids.paid_amount')
     def _compute_total_paid(self):
+        # Aggregate saved loans in the database instead of loading every payment
+        saved = self.filtered('id')
+        totals = {}
+        if saved:
+            groups = self.env['core_banking.loan.payment']._read_group(
+                [('loan_id', 'in', saved.ids)],
+                ['loan_id'],
+                ['paid_amount:sum'],
+            )
+            totals = {loan.id: paid_amount for loan, paid_amount in groups}
         for loan in self:
-            loan.total_paid = sum(payment.paid_amount for payment in loan.payment_ids)
+            if loan.id:
+                loan.total_paid = totals.get(loan.id, 0.0)
+            else:
+                loan.total_paid = sum(loan.payment_ids.mapped('paid_amount'))
     
-    @api.depends('payment_ids.state', 'payment_ids.due_date', 'payment_ids.outstanding_amount')
+    @api.depends('payment_ids.state', 'payment_ids.due_date', 'payment_ids.days_overdue',
+                 'payment_ids.outstanding_amount')
     def _compute_overdue_status(self):
         today = fields.Date.context_today(self)
+        # Aggregate the overdue installments of saved loans in a single query
+        saved = self.filtered('id')
+        overdue = {}
+        if saved:
+            self.env['core_banking.loan.payment'].flush_model(
+                ['loan_id', 'state', 'due_date', 'days_overdue', 'total_amount', 'paid_amount'])
+            self.env.cr.execute("""
+                SELECT loan_id, MAX(days_overdue), SUM(outstanding_amount)
+                  FROM core_banking_loan_payment
+                 WHERE loan_id = ANY(%s)
+                   AND state IN ('pending', 'partial', 'overdue')
+                   AND due_date < %s
+                 GROUP BY loan_id
+            """, (saved.ids, today))
+            overdue = {loan_id: (days, amount) for loan_id, days, amount in self.env.cr.fetchall()}
         for loan in self:
-            overdue_payments = loan.payment_ids.filtered(
-                lambda p: p.state in ['pending', 'partial'] and p.due_date < today
-            )
-            loan.is_overdue = bool(overdue_payments)
-            loan.overdue_days = max(overdue_payments.mapped('days_overdue') or [0])
-            loan.overdue_amount = sum(overdue_payments.mapped('outstanding_amount'))
+            if loan.id:
+                days, amount = overdue.get(loan.id, (None, None))
+                loan.is_overdue = loan.id in overdue
+                loan.overdue_days = days or 0
+                loan.overdue_amount = amount or 0.0
+            else:
+                overdue_payments = loan.payment_ids.filtered(
+                    lambda p: p.state in ['pending', 'partial', 'overdue'] and p.due_date < today
+                )
+                loan.is_overdue = bool(overdue_payments)
+                loan.overdue_days = max(overdue_payments.mapped('days_overdue') or [0])
+                loan.overdue_amount = sum(overdue_payments.mapped('outstanding_amount'))
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.loan') or 'New'
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.loan', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
         return super().create(vals_list)
     
     def action_submit(self):
@@ -161,15 +210,18 @@ class Loan(models.Model):
         
         outstanding_principal = self.principal_amount
         monthly_interest_rate = self.interest_rate / 100 / 12
+        # Interest rate over one payment period, constant for the whole schedule
+        period_interest_rate = monthly_interest_rate * frequency_months
+        disbursement_date = self.disbursement_date
+        loan_id = self.id
         
         payments = []
         for i in range(1, payment_count + 1):
             # Calculate due date
-            due_date = self.disbursement_date + relativedelta(months=i * frequency_months)
+            due_date = add_months(disbursement_date, i * frequency_months)
             
             # Calculate interest on outstanding principal
-            months_elapsed = frequency_months
-            interest_amount = outstanding_principal * monthly_interest_rate * months_elapsed
+            interest_amount = outstanding_principal * period_interest_rate
             principal_amount = payment_amount - interest_amount
             
             # Ensure principal doesn't exceed outstanding
@@ -178,7 +230,7 @@ class Loan(models.Model):
                 payment_amount = principal_amount + interest_amount
             
             payments.append({
-                'loan_id': self.id,
+                'loan_id': loan_id,
                 'payment_number': i,
                 'due_date': due_date,
                 'principal_amount': principal_amount,
@@ -190,7 +242,7 @@ class Loan(models.Model):
             if outstanding_principal <= 0:
                 break
         
-        # Create payment records
+        # One create for the whole schedule, named from a single sequence batch
         self.env['core_banking.loan.payment'].create(payments)
     
     def action_mark_default(self):
@@ -1,9 +1,12 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.sql import create_index
+from .tools import create_generated_column
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 import calendar
+from collections import defaultdict
 
 class LoanPayment(models.Model):
     _name = 'core_banking.loan.payment'
@@ -12,11 +15,11 @@ class LoanPayment(models.Model):
     _order = 'due_date desc'
     
     name = fields.Char(string='Payment Reference', required=True, readonly=True, default='New')
-    loan_id = fields.Many2one('core_banking.loan', string='Loan', required=True, ondelete='cascade')
+    loan_id = fields.Many2one('core_banking.loan', string='Loan', required=True, ondelete='cascade', index=True)
     payment_number = fields.Integer(string='Payment Number', required=True)
     
     # Payment Details
-    due_date = fields.Date(string='Due Date', required=True)
+    due_date = fields.Date(string='Due Date', required=True, index=True)
     principal_amount = fields.Monetary(string='Principal Amount', required=True)
     interest_amount = fields.Monetary(string='Interest Amount', required=True)
     total_amount = fields.Monetary(string='Total Amount', compute='_compute_total_amount', store=True)
@@ -24,7 +27,7 @@ class LoanPayment(models.Model):
     
     # Payment Status
     paid_amount = fields.Monetary(string='Paid Amount', default=0.0)
-    outstanding_amount = fields.Monetary(string='Outstanding Amount', compute='_compute_outstanding_amount', store=True)
+    outstanding_amount = fields.Monetary(string='Outstanding Amount', compute='_compute_outstanding_amount')
     payment_date = fields.Date(string='Payment Date')
     state = fields.Selection([
         ('pending', 'Pending'),
@@ -32,16 +35,25 @@ class LoanPayment(models.Model):
         ('paid', 'Paid'),
         ('overdue', 'Overdue'),
         ('defaulted', 'Defaulted')
-    ], string='Status', default='pending', tracking=True)
+    ], string='Status', default='pending', tracking=True, index=True)
     
     # Late Payment
-    days_overdue = fields.Integer(string='Days Overdue', compute='_compute_days_overdue', store=True)
+    days_overdue = fields.Integer(string='Days Overdue', default=0, readonly=True,
+                                  help='Aged nightly by the overdue installments cron job')
     penalty_amount = fields.Monetary(string='Penalty Amount', default=0.0)
     
     # Related
     company_id = fields.Many2one('res.company', related='loan_id.company_id', store=True)
     transaction_ids = fields.One2many('core_banking.transaction', 'loan_payment_id', string='Transactions')
     
+    def init(self):
+        # Keep outstanding_amount as a generated column so the database maintains it
+        create_generated_column(self.env.cr, self._table, 'outstanding_amount',
+                                "COALESCE(total_amount, 0) - COALESCE(paid_amount, 0)")
+        # Partial index over the unpaid installments scanned by the overdue cron and loan computes
+        create_index(self.env.cr, 'core_banking_loan_payment_overdue_idx', self._table,
+                     ['due_date'], where="state IN ('pending', 'partial', 'overdue')")
+    
     @api.depends('principal_amount', 'interest_amount', 'penalty_amount')
     def _compute_total_amount(self):
         for payment in self:
@@ -52,59 +64,117 @@ class LoanPayment(models.Model):
         for payment in self:
             payment.outstanding_amount = payment.total_amount - payment.paid_amount
     
-    @api.depends('due_date', 'state')
-    def _compute_days_overdue(self):
-        today = fields.Date.context_today(self)
-        for payment in self:
-            if payment.state in ['pending', 'partial'] and payment.due_date < today:
-                payment.days_overdue = (today - payment.due_date).days
-                if payment.days_overdue > 0:
-                    payment.state = 'overdue'
-            else:
-                payment.days_overdue = 0
-    
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.loan.payment') or 'New'
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.loan.payment', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
         return super().create(vals_list)
     
+    @api.model
+    def _cron_update_overdue(self):
+        """Cron job to age the unpaid installments that are past due"""
+        today = fields.Date.context_today(self)
+        self.flush_model(['state', 'due_date', 'days_overdue'])
+        self.env.cr.execute("""
+            UPDATE core_banking_loan_payment
+               SET days_overdue = %s - due_date,
+                   state = 'overdue'
+             WHERE state IN ('pending', 'partial', 'overdue')
+               AND due_date < %s
+         RETURNING id
+        """, (today, today))
+        payments = self.browse([row[0] for row in self.env.cr.fetchall()])
+        payments.invalidate_recordset(['days_overdue', 'state'])
+        payments.modified(['days_overdue', 'state'])
+    
     def action_record_payment(self, amount, payment_date=None):
         """Record a payment against this installment"""
         self.ensure_one()
+        return self.action_record_payments([amount], payment_date=payment_date)
+    
+    def action_record_payments(self, amounts, payment_date=None):
+        """Record payments against several installments at once
+
+        :param amounts: amounts paid, in the same order as the installments
+        :return: the payment transactions
+        """
+        amounts = list(amounts)
+        if len(amounts) != len(self):
+            raise UserError(_('One payment amount is required per installment'))
+        if not self:
+            return self.env['core_banking.transaction']
         
-        if amount <= 0:
+        if any(amount <= 0 for amount in amounts):
             raise UserError(_('Payment amount must be positive'))
         
-        if amount > self.outstanding_amount:
+        # The same installment may be paid several times in one call
+        totals = defaultdict(float)
+        for payment, amount in zip(self, amounts):
+            totals[payment] += amount
+        if any(total > payment.outstanding_amount for payment, total in totals.items()):
             raise UserError(_('Payment amount cannot exceed outstanding amount'))
         
-        # Create transaction
-        transaction = self.env['core_banking.transaction'].create({
+        value_date = payment_date or fields.Date.context_today(self)
+        transaction_date = payment_date or fields.Datetime.now()
+        
+        # Walk the loan -> customer -> accounts chain once for the whole batch, one query per relation
+        customers = self.loan_id.customer_id
+        payer_accounts = {customer: customer.account_ids[:1] for customer in customers.with_prefetch(customers.ids)}
+        
+        # Create transactions
+        transactions = self.env['core_banking.transaction'].create([{
             'transaction_type': 'payment',
-            'account_id': self.loan_id.customer_id.account_ids[0].id if self.loan_id.customer_id.account_ids else False,
+            'account_id': payer_accounts[payment.loan_id.customer_id].id,
             'amount': -amount,  # Negative for payment
-            'reference': f'Loan Payment: {self.name}',
-            'description': f'Payment for loan {self.loan_id.name}',
-            'loan_payment_id': self.id,
-            'transaction_date': payment_date or fields.Datetime.now(),
-            'value_date': payment_date or fields.Date.context_today(self),
+            'reference': f'Loan Payment: {payment.name}',
+            'description': f'Payment for loan {payment.loan_id.name}',
+            'loan_payment_id': payment.id,
+            'transaction_date': transaction_date,
+            'value_date': value_date,
             'state': 'posted',
-        })
+        } for payment, amount in zip(self, amounts)])
         
-        # Update payment record
-        self.paid_amount += amount
-        if not self.payment_date:
-            self.payment_date = payment_date or fields.Date.context_today(self)
+        # Update payment records and their status in one statement
+        payments = self.browse([payment.id for payment in totals])
+        payments.flush_recordset(['paid_amount', 'payment_date', 'state', 'total_amount', 'due_date', 'days_overdue'])
+        # Settled installments stop aging, partly paid ones past due stay overdue
+        self.env.cr.execute("""
+            UPDATE core_banking_loan_payment AS payment
+               SET paid_amount = COALESCE(payment.paid_amount, 0) + paid.amount,
+                   payment_date = COALESCE(payment.payment_date, %s),
+                   state = CASE
+                       WHEN COALESCE(payment.paid_amount, 0) + paid.amount >= payment.total_amount THEN 'paid'
+                       WHEN payment.due_date < %s THEN 'overdue'
+                       WHEN COALESCE(payment.paid_amount, 0) + paid.amount > 0 THEN 'partial'
+                       ELSE payment.state
+                   END,
+                   days_overdue = CASE
+                       WHEN COALESCE(payment.paid_amount, 0) + paid.amount >= payment.total_amount THEN 0
+                       ELSE payment.days_overdue
+                   END
+              FROM unnest(%s::int[], %s::numeric[]) AS paid(id, amount)
+             WHERE payment.id = paid.id
+         RETURNING payment.id, payment.paid_amount, payment.payment_date, payment.state, payment.days_overdue
+        """, (
+            value_date,
+            fields.Date.context_today(self),
+            payments.ids,
+            [totals[payment] for payment in payments],
+        ))
+        ids, paid_amounts, payment_dates, states, days_overdue = zip(*self.env.cr.fetchall())
         
-        # Update status
-        if self.paid_amount >= self.total_amount:
-            self.state = 'paid'
-        elif self.paid_amount > 0:
-            self.state = 'partial'
+        # Put the updated values in cache rather than invalidating them, then let the
+        # dependent loan totals recompute once for the whole batch at the next flush
+        payments = self.browse(ids)
+        self.env.cache.update(payments, self._fields['paid_amount'], [float(amount) for amount in paid_amounts])
+        self.env.cache.update(payments, self._fields['payment_date'], payment_dates)
+        self.env.cache.update(payments, self._fields['state'], states)
+        self.env.cache.update(payments, self._fields['days_overdue'], days_overdue)
+        payments.modified(['paid_amount', 'payment_date', 'state', 'days_overdue'])
         
-        return transaction
+        return transactions
 
 
 class LoanGuarantor(models.Model):
@@ -1,106 +1,25 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
-from datetime import datetime, timedelta
+from odoo.tools import SQL
+from datetime import datetime, time, timedelta
 from dateutil.relativedelta import relativedelta
+from collections import defaultdict
 
-class BankingReport(models.TransientModel):
-    _name = 'core_banking.report'
-    _description = 'Banking Reports'
-    
-    report_type = fields.Selection([
-        ('balance_sheet', 'Balance Sheet'),
-        ('profit_loss', 'Profit & Loss'),
-        ('cash_flow', 'Cash Flow Statement'),
-        ('customer_analysis', 'Customer Analysis'),
-        ('loan_portfolio', 'Loan Portfolio Analysis'),
-        ('deposit_analysis', 'Deposit Analysis'),
-        ('transaction_summary', 'Transaction Summary')
-    ], string='Report Type', required=True)
-    
-    # Date Range
-    date_from = fields.Date(string='From Date', required=True, 
-                           default=lambda self: fields.Date.today().replace(day=1))
-    date_to = fields.Date(string='To Date', required=True,
-                         default=fields.Date.today)
-    
-    # Filters
-    branch_ids = fields.Many2many('core_banking.branch', string='Branches')
-    customer_segment_ids = fields.Many2many('core_banking.customer.segment', string='Customer Segments')
-    account_type_ids = fields.Many2many('core_banking.account.type', string='Account Types')
-    
-    # Report Data
-    report_html = fields.Html(string='Report', readonly=True)
-    
-    def generate_report(self):
-        """Generate the selected report"""
-        self.ensure_one()
-        
-        if self.report_type == 'balance_sheet':
-            self._generate_balance_sheet()
-        elif self.report_type == 'profit_loss':
-            self._generate_profit_loss()
-        elif self.report_type == 'customer_analysis':
-            self._generate_customer_analysis()
-        elif self.report_type == 'loan_portfolio':
-            self._generate_loan_portfolio()
-        elif self.report_type == 'deposit_analysis':
-            self._generate_deposit_analysis()
-        elif self.report_type == 'transaction_summary':
-            self._generate_transaction_summary()
-        
-        return {
-            'name': _('Banking Report'),
-            'view_mode': 'form',
-            'res_model': 'core_banking.report',
-            'res_id': self.id,
-            'type': 'ir.actions.act_window',
-            'target': 'current',
-        }
-    
-    def _generate_balance_sheet(self):
-        """Generate Balance Sheet"""
-        # Customer Deposits (Liabilities)
-        deposits_domain = [
-            ('state', '=', 'active'),
-            ('last_transaction_date', '>=', self.date_from),
-            ('last_transaction_date', '<=', self.date_to)
-        ]
-        if self.branch_ids:
-            deposits_domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        accounts = self.env['core_banking.account'].search(deposits_domain)
-        total_deposits = sum(accounts.mapped('balance'))
-        
-        # Loans (Assets)
-        loans_domain = [
-            ('state', 'in', ['disbursed', 'closed']),
-            ('disbursement_date', '>=', self.date_from),
-            ('disbursement_date', '<=', self.date_to)
-        ]
-        if self.branch_ids:
-            loans_domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        loans = self.env['core_banking.loan'].search(loans_domain)
-        total_loans = sum(loans.mapped('outstanding_balance'))
-        
-        # Fixed Deposits (Liabilities)
-        fd_domain = [
-            ('state', '=', 'active'),
-            ('deposit_date', '>=', self.date_from),
-            ('deposit_date', '<=', self.date_to)
-        ]
-        if self.branch_ids:
-            fd_domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        fixed_deposits = self.env['core_banking.fixed.deposit'].search(fd_domain)
-        total_fixed_deposits = sum(fixed_deposits.mapped('current_value'))
-        
-        # Generate HTML
-        html = f"""
+# Columns needed to compute a fixed deposit's current value
+FIXED_DEPOSIT_VALUE_FIELDS = ['state', 'deposit_date', 'principal_amount', 'interest_rate', 'interest_compounding']
+
+# Static report markup, formatted with str.format() when a report is generated
+REPORT_TABLE_FOOTER = """
+                </tbody>
+            </table>
+        </div>
+"""
+
+BALANCE_SHEET_TEMPLATE = """
         <div class="o_report_layout">
             <h2>Balance Sheet</h2>
-            <p>Period: {self.date_from} to {self.date_to}</p>
+            <p>Period: {date_from} to {date_to}</p>
             
             <table class="table table-striped">
                 <thead>
@@ -139,41 +58,17 @@ class BankingReport(models.TransientModel):
                     </tr>
                     <tr class="table-info">
                         <td><strong>Total Liabilities</strong></td>
-                        <td class="text-right"><strong>{total_deposits + total_fixed_deposits:,.2f}</strong></td>
+                        <td class="text-right"><strong>{total_liabilities:,.2f}</strong></td>
                     </tr>
                 </tbody>
             </table>
         </div>
-        """
-        
-        self.report_html = html
-    
-    def _generate_customer_analysis(self):
-        """Generate Customer Analysis Report"""
-        domain = []
-        if self.branch_ids:
-            domain.append(('branch_id', 'in', self.branch_ids.ids))
-        if self.customer_segment_ids:
-            domain.append(('customer_segment_id', 'in', self.customer_segment_ids.ids))
-        
-        customers = self.env['core_banking.customer'].search(domain)
-        
-        # Customer Segmentation
-        segment_data = {}
-        for customer in customers:
-            segment = customer.customer_segment_id.name if customer.customer_segment_id else 'Unassigned'
-            if segment not in segment_data:
-                segment_data[segment] = {'count': 0, 'total_balance': 0}
-            segment_data[segment]['count'] += 1
-            segment_data[segment]['total_balance'] += customer.total_balance
-        
-        # Top customers by balance
-        top_customers = customers.sorted('total_balance', reverse=True)[:10]
-        
-        html = f"""
+"""
+
+CUSTOMER_ANALYSIS_HEADER = """
         <div class="o_report_layout">
             <h2>Customer Analysis Report</h2>
-            <p>Total Customers: {len(customers)}</p>
+            <p>Total Customers: {total_customers}</p>
             
             <h3>Customer Segmentation</h3>
             <table class="table table-striped">
@@ -186,20 +81,18 @@ class BankingReport(models.TransientModel):
                     </tr>
                 </thead>
                 <tbody>
-        """
-        
-        for segment, data in segment_data.items():
-            avg_balance = data['total_balance'] / data['count'] if data['count'] > 0 else 0
-            html += f"""
+"""
+
+CUSTOMER_SEGMENT_ROW = """
                     <tr>
                         <td>{segment}</td>
-                        <td>{data['count']}</td>
-                        <td>{data['total_balance']:,.2f}</td>
+                        <td>{count}</td>
+                        <td>{total_balance:,.2f}</td>
                         <td>{avg_balance:,.2f}</td>
                     </tr>
-            """
-        
-        html += """
+"""
+
+CUSTOMER_TOP_HEADER = """
                 </tbody>
             </table>
             
@@ -213,53 +106,17 @@ class BankingReport(models.TransientModel):
                     </tr>
                 </thead>
                 <tbody>
-        """
-        
-        for customer in top_customers:
-            html += f"""
+"""
+
+CUSTOMER_TOP_ROW = """
                     <tr>
-                        <td>{customer.name}</td>
-                        <td>{customer.total_balance:,.2f}</td>
-                        <td>{len(customer.account_ids)}</td>
+                        <td>{name}</td>
+                        <td>{total_balance:,.2f}</td>
+                        <td>{account_count}</td>
                     </tr>
-            """
-        
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
-        
-        self.report_html = html
-    
-    def _generate_loan_portfolio(self):
-        """Generate Loan Portfolio Analysis"""
-        domain = [('state', 'in', ['approved', 'disbursed', 'closed', 'defaulted'])]
-        if self.branch_ids:
-            domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        loans = self.env['core_banking.loan'].search(domain)
-        
-        # Portfolio Summary
-        total_loans = len(loans)
-        total_principal = sum(loans.mapped('principal_amount'))
-        total_outstanding = sum(loans.mapped('outstanding_balance'))
-        total_paid = sum(loans.mapped('total_paid'))
-        
-        # Loan Status Breakdown
-        status_data = {}
-        for loan in loans:
-            status = loan.state
-            if status not in status_data:
-                status_data[status] = {'count': 0, 'amount': 0}
-            status_data[status]['count'] += 1
-            status_data[status]['amount'] += loan.principal_amount
-        
-        # Overdue Analysis
-        overdue_loans = loans.filtered('is_overdue')
-        total_overdue_amount = sum(overdue_loans.mapped('overdue_amount'))
-        
-        html = f"""
+"""
+
+LOAN_PORTFOLIO_HEADER = """
         <div class="o_report_layout">
             <h2>Loan Portfolio Analysis</h2>
             
@@ -309,55 +166,18 @@ class BankingReport(models.TransientModel):
                     </tr>
                 </thead>
                 <tbody>
-        """
-        
-        for status, data in status_data.items():
-            percentage = (data['amount'] / total_principal * 100) if total_principal > 0 else 0
-            html += f"""
+"""
+
+LOAN_STATUS_ROW = """
                     <tr>
-                        <td>{status.title()}</td>
-                        <td>{data['count']}</td>
-                        <td>{data['amount']:,.2f}</td>
+                        <td>{status}</td>
+                        <td>{count}</td>
+                        <td>{amount:,.2f}</td>
                         <td>{percentage:.1f}%</td>
                     </tr>
-            """
-        
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
-        
-        self.report_html = html
-    
-    def _generate_deposit_analysis(self):
-        """Generate Deposit Analysis Report"""
-        # Regular Accounts
-        account_domain = [('state', '=', 'active')]
-        if self.branch_ids:
-            account_domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        accounts = self.env['core_banking.account'].search(account_domain)
-        total_account_balance = sum(accounts.mapped('balance'))
-        
-        # Fixed Deposits
-        fd_domain = [('state', '=', 'active')]
-        if self.branch_ids:
-            fd_domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        fixed_deposits = self.env['core_banking.fixed.deposit'].search(fd_domain)
-        total_fd_balance = sum(fixed_deposits.mapped('current_value'))
-        
-        # Account Type Analysis
-        type_data = {}
-        for account in accounts:
-            acc_type = account.account_type_id.name
-            if acc_type not in type_data:
-                type_data[acc_type] = {'count': 0, 'balance': 0}
-            type_data[acc_type]['count'] += 1
-            type_data[acc_type]['balance'] += account.balance
-        
-        html = f"""
+"""
+
+DEPOSIT_ANALYSIS_HEADER = """
         <div class="o_report_layout">
             <h2>Deposit Analysis Report</h2>
             
@@ -366,7 +186,7 @@ class BankingReport(models.TransientModel):
                     <div class="card">
                         <div class="card-body">
                             <h5>Total Accounts</h5>
-                            <h3>{len(accounts)}</h3>
+                            <h3>{total_accounts}</h3>
                         </div>
                     </div>
                 </div>
@@ -399,64 +219,21 @@ class BankingReport(models.TransientModel):
                     </tr>
                 </thead>
                 <tbody>
-        """
-        
-        for acc_type, data in type_data.items():
-            avg_balance = data['balance'] / data['count'] if data['count'] > 0 else 0
-            html += f"""
+"""
+
+DEPOSIT_TYPE_ROW = """
                     <tr>
-                        <td>{acc_type}</td>
-                        <td>{data['count']}</td>
-                        <td>{data['balance']:,.2f}</td>
+                        <td>{account_type}</td>
+                        <td>{count}</td>
+                        <td>{balance:,.2f}</td>
                         <td>{avg_balance:,.2f}</td>
                     </tr>
-            """
-        
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
-        
-        self.report_html = html
-    
-    def _generate_transaction_summary(self):
-        """Generate Transaction Summary Report"""
-        domain = [
-            ('transaction_date', '>=', self.date_from),
-            ('transaction_date', '<=', self.date_to),
-            ('state', '=', 'posted')
-        ]
-        if self.branch_ids:
-            domain.append(('branch_id', 'in', self.branch_ids.ids))
-        
-        transactions = self.env['core_banking.transaction'].search(domain)
-        
-        # Transaction Type Summary
-        type_data = {}
-        for txn in transactions:
-            txn_type = txn.transaction_type
-            if txn_type not in type_data:
-                type_data[txn_type] = {'count': 0, 'amount': 0}
-            type_data[txn_type]['count'] += 1
-            type_data[txn_type]['amount'] += abs(txn.amount)
-        
-        # Daily Transaction Volume
-        daily_data = {}
-        for txn in transactions:
-            date_str = txn.transaction_date.date().strftime('%Y-%m-%d')
-            if date_str not in daily_data:
-                daily_data[date_str] = {'count': 0, 'amount': 0}
-            daily_data[date_str]['count'] += 1
-            daily_data[date_str]['amount'] += abs(txn.amount)
-        
-        total_transactions = len(transactions)
-        total_amount = sum(abs(txn.amount) for txn in transactions)
-        
-        html = f"""
+"""
+
+TRANSACTION_SUMMARY_HEADER = """
         <div class="o_report_layout">
             <h2>Transaction Summary Report</h2>
-            <p>Period: {self.date_from} to {self.date_to}</p>
+            <p>Period: {date_from} to {date_to}</p>
             
             <div class="row">
                 <div class="col-md-6">
@@ -488,26 +265,328 @@ class BankingReport(models.TransientModel):
                     </tr>
                 </thead>
                 <tbody>
-        """
-        
-        for txn_type, data in type_data.items():
-            avg_amount = data['amount'] / data['count'] if data['count'] > 0 else 0
-            html += f"""
+"""
+
+TRANSACTION_TYPE_ROW = """
                     <tr>
-                        <td>{txn_type.title()}</td>
-                        <td>{data['count']}</td>
-                        <td>{data['amount']:,.2f}</td>
+                        <td>{transaction_type}</td>
+                        <td>{count}</td>
+                        <td>{amount:,.2f}</td>
                         <td>{avg_amount:,.2f}</td>
                     </tr>
+"""
+
+class BankingReport(models.TransientModel):
+    _name = 'core_banking.report'
+    _description = 'Banking Reports'
+    
+    report_type = fields.Selection([
+        ('balance_sheet', 'Balance Sheet'),
+        ('profit_loss', 'Profit & Loss'),
+        ('cash_flow', 'Cash Flow Statement'),
+        ('customer_analysis', 'Customer Analysis'),
+        ('loan_portfolio', 'Loan Portfolio Analysis'),
+        ('deposit_analysis', 'Deposit Analysis'),
+        ('transaction_summary', 'Transaction Summary')
+    ], string='Report Type', required=True)
+    
+    # Date Range
+    date_from = fields.Date(string='From Date', required=True, 
+                           default=lambda self: fields.Date.today().replace(day=1))
+    date_to = fields.Date(string='To Date', required=True,
+                         default=fields.Date.today)
+    
+    # Filters
+    branch_ids = fields.Many2many('core_banking.branch', string='Branches')
+    customer_segment_ids = fields.Many2many('core_banking.customer.segment', string='Customer Segments')
+    account_type_ids = fields.Many2many('core_banking.account.type', string='Account Types')
+    
+    # Report Data
+    report_html = fields.Html(string='Report', readonly=True)
+    
+    def generate_report(self):
+        """Generate the selected report"""
+        self.ensure_one()
+        
+        if self.report_type == 'balance_sheet':
+            self._generate_balance_sheet()
+        elif self.report_type == 'profit_loss':
+            self._generate_profit_loss()
+        elif self.report_type == 'customer_analysis':
+            self._generate_customer_analysis()
+        elif self.report_type == 'loan_portfolio':
+            self._generate_loan_portfolio()
+        elif self.report_type == 'deposit_analysis':
+            self._generate_deposit_analysis()
+        elif self.report_type == 'transaction_summary':
+            self._generate_transaction_summary()
+        
+        return {
+            'name': _('Banking Report'),
+            'view_mode': 'form',
+            'res_model': 'core_banking.report',
+            'res_id': self.id,
+            'type': 'ir.actions.act_window',
+            'target': 'current',
+        }
+    
+    def _generate_balance_sheet(self):
+        """Generate Balance Sheet"""
+        # Customer Deposits (Liabilities)
+        deposits_domain = [
+            ('state', '=', 'active'),
+            ('last_transaction_date', '>=', self.date_from),
+            ('last_transaction_date', '<=', self.date_to)
+        ]
+        if self.branch_ids:
+            deposits_domain.append(('branch_id', 'in', self.branch_ids.ids))
+        
+        [(total_deposits,)] = self.env['core_banking.account']._read_group(deposits_domain, [], ['balance:sum'])
+        total_deposits = total_deposits or 0.0
+        
+        # Loans (Assets)
+        loans_domain = [
+            ('state', 'in', ['disbursed', 'closed']),
+            ('disbursement_date', '>=', self.date_from),
+            ('disbursement_date', '<=', self.date_to)
+        ]
+        if self.branch_ids:
+            loans_domain.append(('branch_id', 'in', self.branch_ids.ids))
+        
+        [(total_loans,)] = self.env['core_banking.loan']._read_group(loans_domain, [], ['outstanding_balance:sum'])
+        total_loans = total_loans or 0.0
+        
+        # Fixed Deposits (Liabilities)
+        fd_domain = [
+            ('state', '=', 'active'),
+            ('deposit_date', '>=', self.date_from),
+            ('deposit_date', '<=', self.date_to)
+        ]
+        if self.branch_ids:
+            fd_domain.append(('branch_id', 'in', self.branch_ids.ids))
+        
+        fixed_deposits = self.env['core_banking.fixed.deposit'].search_fetch(fd_domain, FIXED_DEPOSIT_VALUE_FIELDS)
+        total_fixed_deposits = sum(fixed_deposits.mapped('current_value'))
+        
+        self.report_html = BALANCE_SHEET_TEMPLATE.format(
+            date_from=self.date_from,
+            date_to=self.date_to,
+            total_loans=total_loans,
+            total_deposits=total_deposits,
+            total_fixed_deposits=total_fixed_deposits,
+            total_liabilities=total_deposits + total_fixed_deposits,
+        )
+    
+    def _generate_customer_analysis(self):
+        """Generate Customer Analysis Report"""
+        domain = []
+        if self.branch_ids:
+            domain.append(('branch_id', 'in', self.branch_ids.ids))
+        if self.customer_segment_ids:
+            domain.append(('customer_segment_id', 'in', self.customer_segment_ids.ids))
+        
+        Customer = self.env['core_banking.customer']
+        
+        # Customer Segmentation
+        segment_data = {}
+        for segment, count, total_balance in Customer._read_group(
+                domain, ['customer_segment_id'], ['__count', 'total_balance:sum']):
+            segment_data[segment.name if segment else 'Unassigned'] = {
+                'count': count,
+                'total_balance': total_balance or 0.0,
+            }
+        total_customers = sum(data['count'] for data in segment_data.values())
+        
+        # Top customers by balance
+        top_customers = Customer.search(domain, order='total_balance desc nulls last', limit=10)
+        account_counts = dict(self.env['core_banking.account']._read_group(
+            [('customer_id', 'in', top_customers.ids)], ['customer_id'], ['__count']))
+        
+        def render():
+            yield CUSTOMER_ANALYSIS_HEADER.format(total_customers=total_customers)
+            for segment, data in segment_data.items():
+                avg_balance = data['total_balance'] / data['count'] if data['count'] > 0 else 0
+                yield CUSTOMER_SEGMENT_ROW.format(segment=segment, avg_balance=avg_balance, **data)
+            
+            yield CUSTOMER_TOP_HEADER
+            for customer in top_customers:
+                yield CUSTOMER_TOP_ROW.format(
+                    name=customer.name,
+                    total_balance=customer.total_balance,
+                    account_count=account_counts.get(customer, 0),
+                )
+            
+            yield REPORT_TABLE_FOOTER
+        
+        self.report_html = ''.join(render())
+    
+    def _generate_loan_portfolio(self):
+        """Generate Loan Portfolio Analysis"""
+        # Status breakdown, portfolio totals and overdue amount in a single pass:
+        # the ROLLUP grand total row carries the portfolio summary
+        Loan = self.env['core_banking.loan']
+        Loan.check_access('read')
+        domain = [('state', 'in', ['approved', 'disbursed', 'closed', 'defaulted'])]
+        if self.branch_ids:
+            domain.append(('branch_id', 'in', self.branch_ids.ids))
+        Loan.flush_model([
+            'state', 'branch_id', 'principal_amount', 'outstanding_balance',
+            'total_paid', 'is_overdue', 'overdue_amount',
+        ])
+        query = Loan._where_calc(domain)
+        Loan._apply_ir_rules(query, 'read')
+        state = SQL.identifier(query.table, 'state')
+        self.env.cr.execute(SQL(
             """
+            SELECT GROUPING(%s) = 1, %s, COUNT(*),
+                   SUM(%s), SUM(%s), SUM(%s),
+                   SUM(%s) FILTER (WHERE %s)
+              FROM %s
+             WHERE %s
+             GROUP BY ROLLUP(%s)
+             ORDER BY GROUPING(%s), %s
+            """,
+            state, state,
+            SQL.identifier(query.table, 'principal_amount'),
+            SQL.identifier(query.table, 'outstanding_balance'),
+            SQL.identifier(query.table, 'total_paid'),
+            SQL.identifier(query.table, 'overdue_amount'),
+            SQL.identifier(query.table, 'is_overdue'),
+            query.from_clause,
+            query.where_clause,
+            state, state, state,
+        ))
+        
+        # Portfolio Summary and Loan Status Breakdown
+        total_loans = 0
+        total_principal = total_outstanding = total_paid = total_overdue_amount = 0.0
+        status_data = {}
+        for is_total, status, count, principal, outstanding, paid, overdue in self.env.cr.fetchall():
+            if is_total:
+                total_loans = count
+                total_principal = float(principal or 0.0)
+                total_outstanding = float(outstanding or 0.0)
+                total_paid = float(paid or 0.0)
+                total_overdue_amount = float(overdue or 0.0)
+            else:
+                status_data[status] = {'count': count, 'amount': float(principal or 0.0)}
+        
+        def render():
+            yield LOAN_PORTFOLIO_HEADER.format(
+                total_loans=total_loans,
+                total_principal=total_principal,
+                total_outstanding=total_outstanding,
+                total_overdue_amount=total_overdue_amount,
+            )
+            for status, data in status_data.items():
+                percentage = (data['amount'] / total_principal * 100) if total_principal > 0 else 0
+                yield LOAN_STATUS_ROW.format(status=status.title(), percentage=percentage, **data)
+            
+            yield REPORT_TABLE_FOOTER
         
-        html += """
-                </tbody>
-            </table>
-        </div>
-        """
+        self.report_html = ''.join(render())
+    
+    def _generate_deposit_analysis(self):
+        """Generate Deposit Analysis Report"""
+        # Regular Accounts
+        account_domain = [('state', '=', 'active')]
+        if self.branch_ids:
+            account_domain.append(('branch_id', 'in', self.branch_ids.ids))
+        
+        Account = self.env['core_banking.account']
+        [(total_accounts, total_account_balance)] = Account._read_group(
+            account_domain, [], ['__count', 'balance:sum'])
+        total_account_balance = total_account_balance or 0.0
+        
+        # Fixed Deposits
+        fd_domain = [('state', '=', 'active')]
+        if self.branch_ids:
+            fd_domain.append(('branch_id', 'in', self.branch_ids.ids))
         
-        self.report_html = html
+        fixed_deposits = self.env['core_banking.fixed.deposit'].search_fetch(fd_domain, FIXED_DEPOSIT_VALUE_FIELDS)
+        total_fd_balance = sum(fixed_deposits.mapped('current_value'))
+        
+        # Account Type Analysis
+        type_data = {
+            account_type.name: {'count': count, 'balance': balance}
+            for account_type, count, balance in Account._read_group(
+                account_domain, ['account_type_id'], ['__count', 'balance:sum'])
+        }
+        
+        def render():
+            yield DEPOSIT_ANALYSIS_HEADER.format(
+                total_accounts=total_accounts,
+                total_account_balance=total_account_balance,
+                total_fd_balance=total_fd_balance,
+            )
+            for acc_type, data in type_data.items():
+                avg_balance = data['balance'] / data['count'] if data['count'] > 0 else 0
+                yield DEPOSIT_TYPE_ROW.format(account_type=acc_type, avg_balance=avg_balance, **data)
+            
+            yield REPORT_TABLE_FOOTER
+        
+        self.report_html = ''.join(render())
+    
+    def _generate_transaction_summary(self):
+        """Generate Transaction Summary Report"""
+        # Volume per transaction type and day, aggregated by the database
+        # under the same record rules as a regular search
+        Transaction = self.env['core_banking.transaction']
+        Transaction.check_access('read')
+        domain = [
+            ('state', '=', 'posted'),
+            ('transaction_date', '>=', datetime.combine(self.date_from, time.min)),
+            ('transaction_date', '<', datetime.combine(self.date_to + timedelta(days=1), time.min)),
+        ]
+        if self.branch_ids:
+            domain.append(('branch_id', 'in', self.branch_ids.ids))
+        Transaction.flush_model(['transaction_type', 'transaction_date', 'amount', 'state', 'branch_id'])
+        query = Transaction._where_calc(domain)
+        Transaction._apply_ir_rules(query, 'read')
+        self.env.cr.execute(SQL(
+            """
+            SELECT %s, %s::date, COUNT(*), SUM(ABS(%s))
+              FROM %s
+             WHERE %s
+             GROUP BY 1, 2
+             ORDER BY 1, 2
+            """,
+            SQL.identifier(query.table, 'transaction_type'),
+            SQL.identifier(query.table, 'transaction_date'),
+            SQL.identifier(query.table, 'amount'),
+            query.from_clause,
+            query.where_clause,
+        ))
+        
+        # Transaction Type Summary and Daily Transaction Volume
+        type_data = defaultdict(lambda: {'count': 0, 'amount': 0})
+        daily_data = defaultdict(lambda: {'count': 0, 'amount': 0})
+        for txn_type, txn_date, count, amount in self.env.cr.fetchall():
+            amount = float(amount or 0.0)
+            type_data[txn_type]['count'] += count
+            type_data[txn_type]['amount'] += amount
+            day = txn_date.strftime('%Y-%m-%d')
+            daily_data[day]['count'] += count
+            daily_data[day]['amount'] += amount
+        
+        total_transactions = sum(data['count'] for data in type_data.values())
+        total_amount = sum(data['amount'] for data in type_data.values())
+        
+        def render():
+            yield TRANSACTION_SUMMARY_HEADER.format(
+                date_from=self.date_from,
+                date_to=self.date_to,
+                total_transactions=total_transactions,
+                total_amount=total_amount,
+            )
+            for txn_type, data in type_data.items():
+                avg_amount = data['amount'] / data['count'] if data['count'] > 0 else 0
+                yield TRANSACTION_TYPE_ROW.format(
+                    transaction_type=txn_type.title(), avg_amount=avg_amount, **data)
+            
+            yield REPORT_TABLE_FOOTER
+        
+        self.report_html = ''.join(render())
 
 
 class BankingDashboard(models.Model):
@@ -526,16 +605,25 @@ class BankingDashboard(models.Model):
     
     currency_id = fields.Many2one('res.currency', default=lambda self: self.env.company.currency_id)
     
-    @api.depends()  # Will be triggered manually or by cron
+    @api.depends()  # Not stored, so recomputed for the current user on every read
     def _compute_metrics(self):
+        # Aggregated in SQL under the current user's record rules, once for all dashboards
+        Account = self.env['core_banking.account']
+        Loan = self.env['core_banking.loan']
+        active_domain = [('state', '=', 'active')]
+        loans_domain = [('state', 'in', ['disbursed', 'closed'])]
+        
+        [(total_deposits,)] = Account._read_group(active_domain, [], ['balance:sum'])
+        [(total_loans,)] = Loan._read_group(loans_domain, [], ['outstanding_balance:sum'])
+        [(overdue_loans,)] = Loan._read_group(
+            loans_domain + [('is_overdue', '=', True)], [], ['overdue_amount:sum'])
+        
+        metrics = {
+            'total_customers': self.env['core_banking.customer'].search_count(active_domain),
+            'total_accounts': Account.search_count(active_domain),
+            'total_deposits': total_deposits or 0.0,
+            'total_loans': total_loans or 0.0,
+            'overdue_loans': overdue_loans or 0.0,
+        }
         for dashboard in self:
-            # Get current metrics
-            dashboard.total_customers = self.env['core_banking.customer'].search_count([('state', '=', 'active')])
-            dashboard.total_accounts = self.env['core_banking.account'].search_count([('state', '=', 'active')])
-            
-            accounts = self.env['core_banking.account'].search([('state', '=', 'active')])
-            dashboard.total_deposits = sum(accounts.mapped('balance'))
-            
-            loans = self.env['core_banking.loan'].search([('state', 'in', ['disbursed', 'closed'])])
-            dashboard.total_loans = sum(loans.mapped('outstanding_balance'))
-            dashboard.overdue_loans = sum(loans.filtered('is_overdue').mapped('overdue_amount'))
+            dashboard.update(metrics)
@@ -0,0 +1,21 @@
+from odoo.tools import SQL
+
+
+def create_generated_column(cr, tablename, columnname, expression):
+    """Make ``columnname`` a numeric column generated from ``expression``
+
+    The column is left alone when it already is a generated column. Otherwise
+    it is dropped and added back as generated, which rewrites the whole table
+    under an ACCESS EXCLUSIVE lock.
+    """
+    cr.execute("""
+        SELECT is_generated FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s
+    """, (tablename, columnname))
+    row = cr.fetchone()
+    if row and row[0] == 'ALWAYS':
+        return
+    cr.execute(SQL(
+        "ALTER TABLE %s DROP COLUMN IF EXISTS %s, ADD COLUMN %s numeric GENERATED ALWAYS AS (%s) STORED",
+        SQL.identifier(tablename), SQL.identifier(columnname), SQL.identifier(columnname), SQL(expression),
+    ))
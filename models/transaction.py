@@ -1,8 +1,36 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from .tools import create_generated_column
 from datetime import datetime
+from collections import defaultdict
 from dateutil.relativedelta import relativedelta
 
+# Context of internal bulk operations: no mail tracking, creation log or follower subscription
+WITHOUT_TRACKING_CONTEXT = {
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+}
+
+TRANSACTION_TYPES = [
+    ('deposit', 'Deposit'),
+    ('withdrawal', 'Withdrawal'),
+    ('transfer', 'Transfer'),
+    ('fee', 'Fee'),
+    ('interest', 'Interest'),
+    ('payment', 'Payment'),
+    ('refund', 'Refund'),
+    ('reversal', 'Reversal'),
+    ('adjustment', 'Adjustment'),
+    ('other', 'Other')
+]
+
+# Upper-cased transaction type codes shown in display names
+TRANSACTION_TYPE_CODES = {code: code.upper() for code, _label in TRANSACTION_TYPES}
+
 class Transaction(models.Model):
     _name = 'core_banking.transaction'
     _description = 'Bank Transaction'
@@ -10,25 +38,15 @@ class Transaction(models.Model):
     _order = 'transaction_date desc, id desc'
     
     # Transaction Information
-    name = fields.Char(string='Reference', required=True, readonly=True, default='New')
-    transaction_type = fields.Selection([
-        ('deposit', 'Deposit'),
-        ('withdrawal', 'Withdrawal'),
-        ('transfer', 'Transfer'),
-        ('fee', 'Fee'),
-        ('interest', 'Interest'),
-        ('payment', 'Payment'),
-        ('refund', 'Refund'),
-        ('reversal', 'Reversal'),
-        ('adjustment', 'Adjustment'),
-        ('other', 'Other')
-    ], string='Transaction Type', required=True, tracking=True)
+    name = fields.Char(string='Reference', required=True, readonly=True, default='New', index='trigram')
+    transaction_type = fields.Selection(TRANSACTION_TYPES, string='Transaction Type', required=True, tracking=True)
     
     # Account Information
+    # Indexed by the composite account statement indexes created in init()
     account_id = fields.Many2one('core_banking.account', string='Account', required=True, 
-                                ondelete='restrict', index=True, tracking=True)
+                                ondelete='restrict', tracking=True)
     destination_account_id = fields.Many2one('core_banking.account', string='Destination Account',
-                                           ondelete='restrict', index=True, tracking=True)
+                                           ondelete='restrict', tracking=True)
     
     # Amount Information
     amount = fields.Monetary(string='Amount', required=True, tracking=True)
@@ -36,8 +54,9 @@ class Transaction(models.Model):
                                  default=lambda self: self.env.company.currency_id,
                                  ondelete='restrict')
     exchange_rate = fields.Float(string='Exchange Rate', digits=(12, 6), default=1.0)
+    # Not stored by the ORM: init() maintains a matching generated column for SQL readers
     amount_currency = fields.Monetary(string='Amount in Currency', compute='_compute_amount_currency',
-                                    store=True, currency_field='currency_id')
+                                    currency_field='currency_id')
     
     # Status Information
     state = fields.Selection([
@@ -54,7 +73,7 @@ class Transaction(models.Model):
                                      required=True, index=True)
     value_date = fields.Date(string='Value Date', default=fields.Date.context_today,
                             required=True, index=True)
-    reference = fields.Char(string='Reference', index=True)
+    reference = fields.Char(string='External Reference', index='trigram')
     description = fields.Text(string='Description')
     notes = fields.Text(string='Internal Notes')
     
@@ -63,21 +82,21 @@ class Transaction(models.Model):
                                 default=lambda self: self.env.company,
                                 ondelete='restrict')
     branch_id = fields.Many2one('core_banking.branch', string='Branch', 
-                              ondelete='restrict', tracking=True)
+                              ondelete='restrict', index='btree_not_null', tracking=True)
     journal_id = fields.Many2one('account.journal', string='Journal', 
-                                ondelete='restrict', tracking=True)
+                                ondelete='restrict', index='btree_not_null', tracking=True)
     move_id = fields.Many2one('account.move', string='Journal Entry', 
-                             ondelete='set null', copy=False)
+                             ondelete='set null', index='btree_not_null', copy=False)
     loan_payment_id = fields.Many2one('core_banking.loan.payment', string='Loan Payment',
-                                    ondelete='set null')
+                                    ondelete='set null', index='btree_not_null')
     bulk_transaction_id = fields.Many2one('core_banking.bulk.transaction', string='Bulk Transaction',
-                                        ondelete='set null')
+                                        ondelete='set null', index='btree_not_null')
     
     # Reversal Information
     reversed_entry_id = fields.Many2one('core_banking.transaction', string='Reversed Entry',
-                                      ondelete='restrict', copy=False)
+                                      ondelete='restrict', index='btree_not_null', copy=False)
     reversal_id = fields.Many2one('core_banking.transaction', string='Reversal of',
-                                 ondelete='set null', copy=False)
+                                 ondelete='restrict', index='btree_not_null', copy=False)
     
     # Audit Fields
     created_by = fields.Many2one('res.users', string='Created By', 
@@ -86,16 +105,55 @@ class Transaction(models.Model):
     created_date = fields.Datetime(string='Created On', default=fields.Datetime.now, 
                                  readonly=True)
     posted_by = fields.Many2one('res.users', string='Posted By', 
-                              ondelete='set null', readonly=True)
+                              ondelete='restrict', index='btree_not_null', readonly=True)
     posted_date = fields.Datetime(string='Posted On', readonly=True)
     
-    # Computed Fields
-    display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
-    
     _sql_constraints = [
         ('amount_positive', 'CHECK(amount != 0)', 'Transaction amount cannot be zero!'),
+        ('reversed_has_reversal', "CHECK(state != 'reversed' OR reversal_id IS NOT NULL)",
+         'Reversed transactions must be linked to their reversal!'),
+        ('posted_has_audit',
+         "CHECK(state NOT IN ('posted', 'reconciled') OR (posted_by IS NOT NULL AND posted_date IS NOT NULL))",
+         'Posted transactions must record who posted them and when!'),
     ]
     
+    def init(self):
+        # Keep amount_currency as a generated column so the database computes it on insert
+        create_generated_column(self.env.cr, self._table, 'amount_currency',
+                                "amount * COALESCE(exchange_rate, 1.0)")
+        # Transactions created already posted used to skip the audit stamp; fill it in
+        # from the creation stamp, then add posted_has_audit if it was refused above
+        self.env.cr.execute(f"""
+            UPDATE {self._table}
+               SET posted_by = COALESCE(posted_by, create_uid),
+                   posted_date = COALESCE(posted_date, create_date)
+             WHERE state IN ('posted', 'reconciled')
+               AND (posted_by IS NULL OR posted_date IS NULL)
+        """)
+        self._add_sql_constraints()
+        # Posted transactions in a date range back the transaction summary report
+        create_index(self.env.cr, f'{self._table}_state_date_idx', self._table,
+                     ['state', 'transaction_date'])
+        # Account statements: one account's transactions in a state, newest first. These
+        # replace the single column indexes the ORM used to create on both accounts.
+        self.env.cr.execute(SQL(
+            "DROP INDEX IF EXISTS %s, %s",
+            SQL.identifier(f'{self._table}__account_id_index'),
+            SQL.identifier(f'{self._table}__destination_account_id_index'),
+        ))
+        create_index(self.env.cr, f'{self._table}_acct_state_date_idx', self._table,
+                     ['account_id', 'state', 'transaction_date DESC'])
+        create_index(self.env.cr, f'{self._table}_dest_state_date_idx', self._table,
+                     ['destination_account_id', 'state', 'transaction_date DESC'],
+                     where='destination_account_id IS NOT NULL')
+        # Matching the counterpart of a transfer
+        create_index(self.env.cr, f'{self._table}_transfer_match_idx', self._table,
+                     ['destination_account_id', 'account_id', 'transaction_date', 'amount'],
+                     where="transaction_type = 'transfer'")
+        # Transactions still waiting to be posted or cancelled
+        create_index(self.env.cr, f'{self._table}_pending_idx', self._table,
+                     ['transaction_date'], where="state IN ('draft', 'pending')")
+    
     @api.depends('amount', 'exchange_rate')
     def _compute_amount_currency(self):
         for record in self:
@@ -103,84 +161,121 @@ class Transaction(models.Model):
     
     @api.depends('name', 'transaction_type', 'amount', 'currency_id')
     def _compute_display_name(self):
+        symbols = {currency: currency.symbol or '' for currency in self.currency_id}
         for record in self:
-            record.display_name = f"{record.name or 'TX'}: {record.transaction_type.upper()} {record.currency_id.symbol}{abs(record.amount):,.2f}"
+            record.display_name = '%s: %s %s%s' % (
+                record.name or 'TX',
+                TRANSACTION_TYPE_CODES.get(record.transaction_type, ''),
+                symbols.get(record.currency_id, ''),
+                format(abs(record.amount), ',.2f'),
+            )
     
     @api.model_create_multi
     def create(self, vals_list):
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.transaction', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
+        # Transactions created already posted carry the same audit stamp as posted ones
+        now = fields.Datetime.now()
         for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.transaction') or 'New'
+            if vals.get('state') in ('posted', 'reconciled'):
+                vals.setdefault('posted_by', self.env.uid)
+                vals.setdefault('posted_date', now)
         return super().create(vals_list)
     
     def write(self, vals):
         if 'state' in vals and vals['state'] == 'posted':
-            vals['posted_by'] = self.env.user.id
+            vals['posted_by'] = self.env.uid
             vals['posted_date'] = fields.Datetime.now()
         return super().write(vals)
     
+    def _without_tracking(self):
+        """Return these transactions in a context that skips mail tracking and logging"""
+        return self.with_context(**WITHOUT_TRACKING_CONTEXT)
+    
     def action_post(self):
-        """Post the transaction and update account balances"""
-        for record in self.filtered(lambda t: t.state in ['draft', 'pending']):
-            # Validate sufficient balance for debits
-            if record.amount < 0:  # Debit transaction
-                available_balance = record.account_id.available_balance
-                if abs(record.amount) > available_balance:
-                    raise UserError(_('Insufficient available balance. Available: %s, Required: %s') % 
-                                  (available_balance, abs(record.amount)))
-            
+        """Post the transactions and update account balances
+        
+        Internal bulk postings call this on _without_tracking() records to skip mail tracking.
+        """
+        to_post = self.filtered(lambda t: t.state in ['draft', 'pending'])
+        if not to_post:
+            return
+        
+        # Lock every account involved up front, in a stable order
+        (to_post.account_id | to_post.destination_account_id)._lock_balances()
+        deltas = to_post._get_balance_deltas()
+        
+        # write() fills in posted_by and posted_date
+        to_post.write({'state': 'posted'})
+        # Also stamps the last transaction date on every account involved, and refuses
+        # the whole batch if it would take any account past its available balance
+        self.env['core_banking.account']._apply_balance_deltas(
+            deltas, when=to_post[:1].posted_date, check_available=True)
+    
+    def _get_balance_deltas(self):
+        """Return the net balance change per account id for posting these transactions"""
+        self.fetch(['account_id', 'destination_account_id', 'amount', 'transaction_type', 'reversed_entry_id'])
+        deltas = defaultdict(float)
+        for record in self:
             # Update account balance using the amount as stored (positive/negative)
-            record.account_id.balance += record.amount
-            
-            # For transfers, update destination account
-            if record.transaction_type == 'transfer' and record.destination_account_id:
-                record.destination_account_id.balance += abs(record.amount)
+            deltas[record.account_id.id] += record.amount
             
-            # Update transaction state
-            record.write({
-                'state': 'posted',
-                'posted_by': self.env.user.id,
-                'posted_date': fields.Datetime.now()
-            })
-            
-            # Update last transaction date on account
-            current_time = fields.Datetime.now()
-            record.account_id.last_transaction_date = current_time
+            # For transfers, update destination account; reversing a transfer takes it back
             if record.destination_account_id:
-                record.destination_account_id.last_transaction_date = current_time
+                if record.transaction_type == 'transfer':
+                    destination_amount = abs(record.amount)
+                elif record.transaction_type == 'reversal' and record.reversed_entry_id.transaction_type == 'transfer':
+                    destination_amount = -abs(record.amount)
+                else:
+                    destination_amount = 0.0
+                deltas[record.destination_account_id.id] += destination_amount
+        return deltas
     
     def action_reverse(self, date=None):
         """Reverse a posted transaction"""
-        reversed_transactions = self.env['core_banking.transaction']
+        to_reverse = self.filtered(lambda t: t.state == 'posted' and not t.reversal_id)
+        if not to_reverse:
+            return to_reverse
         
-        for record in self.filtered(lambda t: t.state == 'posted' and not t.reversal_id):
-            # Create reversal transaction
-            reversal_vals = {
-                'transaction_type': 'reversal',
-                'account_id': record.account_id.id,
-                'destination_account_id': record.destination_account_id.id,
-                'amount': -record.amount,  # Reverse the amount
-                'currency_id': record.currency_id.id,
-                'exchange_rate': record.exchange_rate,
-                'reference': f"REV-{record.reference or record.name}",
-                'description': f"Reversal of {record.name}",
-                'reversed_entry_id': record.id,
-                'transaction_date': date or fields.Datetime.now(),
-                'value_date': date or fields.Date.context_today(record),
-                'state': 'posted',
-            }
-            
-            reversal = self.create(reversal_vals)
-            reversal.action_post()
-            
-            # Link reversal to original transaction
-            record.reversal_id = reversal.id
-            reversed_transactions |= reversal
-            
-            # Update original transaction state
-            record.state = 'reversed'
+        now = fields.Datetime.now()
+        transaction_date = date or now
+        value_date = date or fields.Date.context_today(self)
+        
+        (to_reverse.account_id | to_reverse.destination_account_id)._lock_balances()
         
-        return reversed_transactions
+        # Create the reversal transactions directly as posted, the chatter of the
+        # originals records the reversal
+        reversals = self._without_tracking().create([{
+            'transaction_type': 'reversal',
+            'account_id': record.account_id.id,
+            'destination_account_id': record.destination_account_id.id,
+            'amount': -record.amount,  # Reverse the amount
+            'currency_id': record.currency_id.id,
+            'exchange_rate': record.exchange_rate,
+            'reference': f"REV-{record.reference or record.name}",
+            'description': f"Reversal of {record.name}",
+            'reversed_entry_id': record.id,
+            'transaction_date': transaction_date,
+            'value_date': value_date,
+            'state': 'posted',
+            'posted_by': self.env.uid,
+            'posted_date': now,
+        } for record in to_reverse])
+        
+        # Reversals move every balance by the opposite of the original posting
+        deltas = {account_id: -amount for account_id, amount in to_reverse._get_balance_deltas().items()}
+        self.env['core_banking.account']._apply_balance_deltas(deltas, when=now, check_available=True)
+        
+        # Link reversals to original transactions
+        for record, reversal in zip(to_reverse, reversals):
+            record.reversal_id = reversal
+        
+        # Update original transaction state
+        to_reverse.write({'state': 'reversed'})
+        
+        return reversals
     
     def action_cancel(self):
         """Cancel a draft or pending transaction"""
@@ -197,15 +292,20 @@ class Transaction(models.Model):
         if self.reversal_id:
             related_ids.append(self.reversal_id.id)
         if self.transaction_type == 'transfer' and self.destination_account_id:
-            related_transfer = self.search([
-                ('transaction_type', '=', 'transfer'),
-                ('account_id', '=', self.destination_account_id.id),
-                ('destination_account_id', '=', self.account_id.id),
-                ('amount', '=', self.amount),
-                ('transaction_date', '=', self.transaction_date)
-            ], limit=1)
-            if related_transfer:
-                related_ids.append(related_transfer.id)
+            # Single probe of the transfer match index, only the id is needed
+            self.flush_model(['transaction_type', 'account_id', 'destination_account_id',
+                              'amount', 'transaction_date'])
+            self.env.cr.execute("""
+                SELECT id FROM core_banking_transaction
+                 WHERE transaction_type = 'transfer'
+                   AND destination_account_id = %s
+                   AND account_id = %s
+                   AND transaction_date = %s
+                   AND amount = %s
+                 ORDER BY id DESC
+                 LIMIT 1
+            """, (self.account_id.id, self.destination_account_id.id, self.transaction_date, self.amount))
+            related_ids.extend(row[0] for row in self.env.cr.fetchall())
         
         return {
             'name': _('Related Transactions'),
@@ -233,16 +333,17 @@ class TransactionReconciliation(models.Model):
     
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            if vals.get('name', 'New') == 'New':
-                vals['name'] = self.env['ir.sequence'].next_by_code('core_banking.transaction.reconciliation') or 'New'
+        to_name = [vals for vals in vals_list if vals.get('name', 'New') == 'New']
+        names = self.env['ir.sequence']._next_by_code_batch('core_banking.transaction.reconciliation', len(to_name))
+        for vals, name in zip(to_name, names):
+            vals['name'] = name or 'New'
         return super().create(vals_list)
     
     def action_reconcile(self):
         """Mark selected transactions as reconciled"""
-        for record in self:
-            record.transaction_ids.write({
-                'state': 'reconciled',
-                'reconciled_by': self.env.user.id,
-                'reconciliation_date': fields.Datetime.now()
-            })
+        self.transaction_ids.write({'state': 'reconciled'})
+        # Who reconciled and when is recorded on the reconciliations themselves
+        self.write({
+            'reconciled_by': self.env.uid,
+            'reconciliation_date': fields.Datetime.now()
+        })